@@ -1,9 +1,19 @@
 # app.py
 
+import importlib
+import os
+import time
+
+# Inicio del script, para el perfil de arranque (imports y loaders)
+_script_start = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from utils import load_all_data, get_energy_summary, load_netanim_data, FILES
+from instrumentacion import instrumented, stage, stages_frame, stages_summary, clear_stages, export_json, export_prometheus
+from utils import get_energy_summary, compute_kpis, kpi_scenarios, aggregate_replicates, replicate_error_bars, REPLICATE_CONFIDENCE, ComparisonCube, CUBE_METRICS, scenario_mask, aggregate_flows, rescale_histograms, histograms_cdf, discover_scenarios, registry_files, flowmonitor_index, read_flow_elements, IncrementalResults, LiveResults, SharedStore, FigureCache, payload_bytes, files_version, split_by_scenario, concat_scenarios, probe_delay_contribution, flow_time_edges, flow_time_series, loss_onset, FLOW_SERIES_BINS, FLOW_LOSS_THRESHOLD, resample_netanim, SpatialIndex, ANIM_MAX_FRAMES, downsample_traces, trace_envelope, TRACE_MAX_POINTS, HIST_COLUMNS, FLUJOS_COLUMNS, SCENARIO_KEYS
+
+# Tiempos (etiqueta, segundos) de la ejecución actual del script
+startup_profile = [('Imports (streamlit, pandas, utils)', time.perf_counter() - _script_start)]
 
 # Configuración de la página (Título y layout)
 st.set_page_config(
@@ -12,47 +22,263 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Presupuesto del JSON de la animación enviado al navegador (estimado por punto dibujado)
+ANIM_PAYLOAD_BUDGET_BYTES = 20 * 1024 * 1024
+ANIM_BYTES_PER_POINT = 64
+
+# Resoluciones de los histogramas: (factor de agrupación, bins por década logarítmica)
+HIST_RESOLUTIONS = {
+    'Original': (1, None),
+    'Agrupada x10': (10, None),
+    'Logarítmica': (1, 10),
+}
+
+# Métodos de reducción de puntos de las trazas de energía
+TRACE_DOWNSAMPLING = {'LTTB': 'lttb', 'Mín/Máx por intervalo': 'minmax'}
+
+# Nodos de la traza que se muestran por defecto (los de menor energía restante)
+TRACE_DEFAULT_NODES = 5
+
+# Puntos dibujados en total entre todos los nodos seleccionados de la traza
+TRACE_POINT_BUDGET = 20_000
+
+# Campos de la 5-tupla por los que se pueden reagrupar los flujos
+FLOW_GROUP_OPTIONS = {
+    'Escenario': 'Escenario_Completo',
+    'Dirección de origen': 'sourceAddress',
+    'Dirección de destino': 'destinationAddress',
+    'Puerto de origen': 'sourcePort',
+    'Puerto de destino': 'destinationPort',
+}
+
+# Series temporales de los flujos (etiqueta -> columna de flow_time_series)
+FLOW_SERIES_OPTIONS = {
+    'Tasa de pérdida (%)': 'Tasa_Perdida (%)',
+    'Carga ofrecida (paquetes/s)': 'Carga_Ofrecida (pps)',
+    'Carga entregada (paquetes/s)': 'Carga_Entregada (pps)',
+    'Throughput ofrecido (bps)': 'Throughput_Ofrecido (bps)',
+    'Throughput entregado (bps)': 'Throughput_Entregado (bps)',
+    'Flujos activos': 'Flujos_Activos',
+}
+
+# Modos de carga de los resultados
+LOAD_MODES = ["Completa", "Incremental", "En vivo"]
+
+# Periodo de sondeo del modo en vivo (segundos)
+LIVE_REFRESH_SECONDS = 5
+
+# Perfil de arranque: SIMULADOR_PERFIL=1 o ?perfil=1 en la URL
+PROFILE_ENABLED = os.environ.get('SIMULADOR_PERFIL') == '1' or st.query_params.get('perfil') == '1'
+
+def profiled(label, func, *args, **kwargs):
+    """Ejecuta func(...) como etapa instrumentada y anota su duración en el perfil de arranque."""
+    start = time.perf_counter()
+    with stage(label) as info:
+        info['resultado'] = func(*args, **kwargs)
+    startup_profile.append((label, time.perf_counter() - start))
+    return info['resultado']
+
+def plotly_express():
+    """Importa plotly.express solo cuando una pestaña va a dibujar un gráfico."""
+    return profiled('Import plotly.express', importlib.import_module, 'plotly.express')
+
 # --- Carga de Datos y Caching ---
 @st.cache_data
-def load_data_and_summary():
-    """Carga y procesa datos, incluyendo métricas e histogramas."""
-    df_energia, df_metricas, df_histograms = load_all_data()
+def load_scenario_registry():
+    """Descubre los escenarios disponibles sin abrir sus archivos."""
+    return discover_scenarios()
+
+@st.cache_data(show_spinner="Agregando réplicas...")
+def load_replicate_stats(_registry, scenarios, version):
+    """KPIs con intervalos de confianza entre las réplicas (semillas) de los escenarios indicados.
+
+    ``version`` (marcas de sus archivos) invalida la caché si cambian los resultados.
+    """
+    return aggregate_replicates(_registry, scenarios)
+
+def figure_bytes(value):
+    """Tamaño aproximado de una entrada de la caché de figuras (figura, tupla o dict de figuras).
+
+    Suma los arrays de las trazas y fotogramas sin serializar a JSON, que en las
+    animaciones grandes costaría tanto como construir la figura.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(map(figure_bytes, value))
+    if isinstance(value, dict):
+        return sum(map(figure_bytes, value.values()))
+    if not hasattr(value, 'frames'):
+        return payload_bytes(value)
+    traces = list(value.data) + [trace for frame in value.frames for trace in frame.data]
+    # _props es el dict de cada traza sin copiar (to_plotly_json haría un deepcopy)
+    return sum(payload_bytes(trace._props) for trace in traces)
+
+@st.cache_resource
+def figure_cache():
+    """Figuras construidas, compartidas por todas las sesiones (LRU acotada en bytes)."""
+    return FigureCache(size=figure_bytes)
+
+@st.cache_resource
+def shared_store():
+    """Almacén de solo lectura compartido por todas las sesiones (sin copias por sesión)."""
+    return SharedStore(load_scenario_registry())
+
+@st.cache_resource(max_entries=4)
+def incremental_results(classes=('ENERGIA', 'METRICAS')):
+    """Frames que se actualizan re-parseando solo los archivos modificados (compartidos entre sesiones).
+
+    Siguen todo el directorio de resultados, así que los escenarios o
+    ejecuciones que aparecen después de arrancar la app entran en el siguiente refresh.
+    """
+    return IncrementalResults(classes=classes)
+
+@st.cache_resource
+def live_results():
+    """Agregados en vivo de una simulación en curso (compartidos entre sesiones, sin filtrar escenarios)."""
+    return LiveResults()
+
+@st.cache_resource(max_entries=8, show_spinner="Construyendo el índice espacial...")
+def spatial_index(escenario, version, _df_events, _df_energy):
+    """Índice espacial de un escenario (compartido); ``version`` cambia si cambian sus datos."""
+    return SpatialIndex(_df_events, _df_energy)
+
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def poll_live_results(store):
+    """Sondea los archivos en curso y vuelve a dibujar la página solo si hay datos nuevos."""
+    changed_scenarios = store.poll()
+    st.caption(f"🟢 En vivo: se consulta cada {LIVE_REFRESH_SECONDS} s")
+    if changed_scenarios:
+        st.rerun()
+
+@instrumented()
+def build_animation_figure(df_events, fps, title):
+    """Construye la animación de nodos remuestreada dentro del presupuesto de payload."""
+    df_frames = resample_netanim(df_events, fps, ANIM_MAX_FRAMES, ANIM_PAYLOAD_BUDGET_BYTES // ANIM_BYTES_PER_POINT)
+
+    px = plotly_express()
+    fig = px.scatter(
+        df_frames, 
+        x='X', 
+        y='Y', 
+        animation_frame='Time',
+        color='Node_ID', 
+        hover_name='Node_ID',
+        range_x=[df_frames['X'].min() - 5, df_frames['X'].max() + 5],
+        range_y=[df_frames['Y'].min() - 5, df_frames['Y'].max() + 5],
+        title=title,
+        labels={'X': 'Coordenada X', 'Y': 'Coordenada Y'}
+    )
+    # Tamaño fijo del marcador sin enviar una columna de tamaños por punto
+    fig.update_traces(marker={'size': 15})
+    for frame in fig.frames:
+        for trace in frame.data:
+            trace.marker.size = 15
     
-    if df_energia.empty:
-        df_energia_summary = pd.DataFrame(columns=['Escenario_Completo', 'Energia_Promedio(J)', 'Energia_Total(J)', 'Escenario', 'Tipo'])
-    else:
-        df_energia_summary = get_energy_summary(df_energia)
-        
-    return df_energia, df_metricas, df_energia_summary, df_histograms
-
-@st.cache_data
-def load_all_netanim_data():
-    """Carga todos los datos de animación disponibles."""
-    anim_keys = [k for k in FILES if 'ANIM' in k]
-    all_df = []
-    for key in anim_keys:
-        try:
-            df = load_netanim_data(key)
-            scenario_name = f"{'S_con_Seguridad' if key.startswith('S_') else 'NS_sin_Seguridad'} - {'Base' if 'BASE' in key else 'Ataque'}"
-            df['Escenario_Completo'] = scenario_name
-            all_df.append(df)
-        except Exception as e:
-            # print(f"Error cargando archivo NetAnim {key}: {e}")
-            pass
-            
-    if not all_df:
-        return pd.DataFrame(columns=['Time', 'Node_ID', 'X', 'Y', 'Escenario_Completo'])
-        
-    return pd.concat(all_df, ignore_index=True)
+    fig.update_layout(
+        transition={'duration': 100},
+        yaxis = {'scaleanchor':"x", 'scaleratio':1},
+        margin=dict(t=50, b=50, l=50, r=50)
+    )
+    
+    if fig.layout.updatemenus:
+        fig.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = 100 
+        fig.layout.updatemenus[0].buttons[0].args[1]['transition']['duration'] = 50
+
+    return fig, df_frames['Time'].nunique(), df_frames.attrs['nodos_mostrados'], df_frames.attrs['nodos']
+
+@instrumented()
+def build_flow_series_figure(parts, column, series_label, n_bins):
+    """Serie temporal de los flujos por escenario y primer instante con pérdidas sobre el umbral."""
+    # Mismos bordes para todos los escenarios, para comparar NS y S sobre el mismo eje
+    edges = flow_time_edges(list(parts.values()), n_bins)
+    df_series = pd.concat([
+        flow_time_series(df, edges).assign(Escenario_Completo=escenario) for escenario, df in parts.items()
+    ], ignore_index=True)
+    fig = plotly_express().line(
+        df_series,
+        x='Tiempo (s)',
+        y=column,
+        color='Escenario_Completo',
+        title=f'{series_label} por Intervalo de {edges[1] - edges[0]:.3g} s',
+        labels={column: series_label, 'Escenario_Completo': 'Escenario'}
+    )
+    # Primer intervalo con pérdidas por encima del umbral: dónde empieza a notarse el ataque
+    onsets = {escenario: loss_onset(df) for escenario, df in df_series.groupby('Escenario_Completo', sort=False)}
+    return fig, onsets
+
+@instrumented()
+def build_distribution_figures(df_hist, factor, bins_per_decade):
+    """Histogramas de retardo y jitter reescalados y CDF del retardo (None si no hay datos)."""
+    px = plotly_express()
+    df_hist_scaled = rescale_histograms(df_hist, factor=factor, bins_per_decade=bins_per_decade)
+    figures = []
+    for metric, name in (('Delay', 'Retardo'), ('Jitter', 'Jitter')):
+        df_metric = df_hist_scaled[df_hist_scaled['Métrica'] == metric]
+        figures.append(None if df_metric.empty else px.bar(
+            df_metric,
+            x='Rango_Inicio (s)',
+            y='Conteo',
+            color='Escenario_Completo',
+            barmode='group',
+            title=f'Histograma de {name} de Paquetes (Segundos)',
+            labels={'Rango_Inicio (s)': f'Rango de {name} (s)', 'Conteo': 'Conteo de Paquetes'}
+        ).update_xaxes(type='category'))
+
+    # La CDF sale de los bins originales, sin reescalar
+    df_delay_cdf = histograms_cdf(df_hist[df_hist['Métrica'] == 'Delay'])
+    figures.append(None if df_delay_cdf.empty else px.line(
+        df_delay_cdf,
+        x='Valor (s)',
+        y='Fracción_Acumulada',
+        color='Escenario_Completo',
+        line_shape='hv',
+        log_x=bins_per_decade is not None,
+        title='Distribución Acumulada del Retardo (CDF)',
+        labels={'Valor (s)': 'Retardo (s)', 'Fracción_Acumulada': 'Fracción de Paquetes'}
+    ))
+    return tuple(figures)
+
+@instrumented()
+def build_trace_figure(df_trace, nodes, method, title):
+    """Trazas reducidas de los nodos elegidos; devuelve también el número de puntos dibujados."""
+    points_per_node = min(TRACE_MAX_POINTS, max(10, TRACE_POINT_BUDGET // max(len(nodes), 1)))
+    df_plot = downsample_traces(df_trace, list(nodes), points_per_node, method)
+    df_plot['Nodo_ID'] = df_plot['Nodo_ID'].astype(str)
+    fig = plotly_express().line(
+        df_plot,
+        x='Tiempo(s)',
+        y='Energia_Restante(J)',
+        color='Nodo_ID',
+        render_mode='webgl',
+        title=title,
+        labels={'Energia_Restante(J)': 'Energía Restante (J)', 'Tiempo(s)': 'Tiempo (s)', 'Nodo_ID': 'Nodo'}
+    )
+    return fig, len(df_plot)
 
-# Cargar todos los datos
-df_energia, df_metricas, df_energia_summary, df_histograms = load_data_and_summary()
-df_netanim = load_all_netanim_data()
+@instrumented()
+def build_envelope_figure(df_trace):
+    """Envolvente de todos los nodos (mínimo, promedio y máximo por intervalo)."""
+    df_envelope = trace_envelope(df_trace, TRACE_MAX_POINTS).melt(
+        id_vars='Tiempo(s)', var_name='Estadístico', value_name='Energía (J)'
+    )
+    return plotly_express().line(
+        df_envelope,
+        x='Tiempo(s)',
+        y='Energía (J)',
+        color='Estadístico',
+        render_mode='webgl',
+        title='Energía Restante de Todos los Nodos (Mín/Promedio/Máx)',
+        labels={'Tiempo(s)': 'Tiempo (s)'}
+    )
 
-# Obtener lista única de escenarios para el filtro
-unique_scenarios = sorted(df_metricas['Escenario_Completo'].unique().tolist())
-if not unique_scenarios:
-     unique_scenarios = ['No data']
+@instrumented()
+def build_energy_heatmap(index, instante):
+    """Mapa de calor de la energía consumida por celda del índice espacial en un instante."""
+    energy, centers_x, centers_y = index.grid_energy(instante)
+    return plotly_express().imshow(
+        energy, x=centers_x, y=centers_y, origin='lower', aspect='equal', color_continuous_scale='Inferno',
+        title=f"Energía Consumida por Celda ({index.cell_size:.1f} x {index.cell_size:.1f})",
+        labels={'x': 'Coordenada X', 'y': 'Coordenada Y', 'color': 'Energía (J)'}
+    )
 
 # --- Diseño de la Interfaz ---
 st.title("🛡️ Análisis de Rendimiento y Seguridad en Redes IoT")
@@ -62,6 +288,23 @@ st.markdown("---")
 
 # --- BARRA LATERAL (Filtros Globales) ---
 st.sidebar.header("Filtros de Escenario")
+
+# Modo de carga: completa (caché), incremental (solo archivos modificados) o en vivo (simulación en curso)
+load_mode = st.sidebar.radio(
+    "Modo de carga", LOAD_MODES, horizontal=True,
+    help="Incremental re-parsea solo los archivos nuevos o modificados; En vivo sigue una simulación en curso."
+)
+
+# Obtener lista única de escenarios para el filtro. En los modos incremental y en vivo
+# se redescubre en cada ejecución (solo un glob) para ver los escenarios que van apareciendo
+if load_mode == "Completa":
+    scenario_registry = profiled('Registro de escenarios', load_scenario_registry)
+else:
+    scenario_registry = profiled('Registro de escenarios', discover_scenarios)
+unique_scenarios = sorted(scenario_registry['Escenario_Completo'].unique().tolist())
+if not unique_scenarios:
+     unique_scenarios = ['No data']
+
 select_all = st.sidebar.checkbox("Seleccionar Todos los Escenarios", value=True)
 
 if select_all:
@@ -73,23 +316,112 @@ else:
         default=unique_scenarios
     )
 
-# Filtro de DataFrames Globales
-df_metricas_filtered = df_metricas[df_metricas['Escenario_Completo'].isin(selected_scenarios)]
-df_energia_summary_filtered = df_energia_summary[df_energia_summary['Escenario_Completo'].isin(selected_scenarios)]
+# Cargar solo los datos de los escenarios seleccionados y los de referencia de los KPIs,
+# que salen del registro (celdas modo x tipo, en las ejecuciones seleccionadas)
+scenarios_to_load = tuple(sorted(set(selected_scenarios) | set(kpi_scenarios(scenario_registry, selected_scenarios))))
+
+# Agregación de réplicas: solo si alguna configuración tiene varias ejecuciones (semillas)
+has_replicas = bool(scenario_registry.groupby(['Escenario', 'Tipo'])['Ejecucion'].nunique().gt(1).any())
+aggregate_runs = has_replicas and st.sidebar.checkbox(
+    "Agregar réplicas (semillas)",
+    help=f"Barras con la media entre ejecuciones e intervalo de confianza del {REPLICATE_CONFIDENCE:.0%}."
+)
 
+if load_mode == "Incremental":
+    store = incremental_results()
+    st.sidebar.button("Buscar cambios")
+    changed_scenarios = profiled('Recarga incremental', store.refresh)
+    if changed_scenarios:
+        st.sidebar.caption(f"Actualizados: {', '.join(sorted(changed_scenarios))}")
+    data_parts, errores_datos = store.scenario_parts()
+elif load_mode == "En vivo":
+    store = live_results()
+    with st.sidebar:
+        poll_live_results(store)
+    *frames, errores_datos = store.data()
+    data_parts = dict(zip(SharedStore.KINDS['datos'][1], map(split_by_scenario, frames)))
+else:
+    data_parts, errores_datos = profiled(
+        'Energía, métricas e histogramas', shared_store().get, 'datos', scenarios_to_load
+    )
+if load_mode != "Completa":
+    # Los almacenes incremental y en vivo siguen todo el directorio: solo se usan los escenarios a cargar
+    data_parts = {
+        name: {escenario: parts[escenario] for escenario in scenarios_to_load if escenario in parts}
+        for name, parts in data_parts.items()
+    }
+
+# Archivos que no se pudieron cargar o con datos parciales (en lugar de ignorarlos en silencio)
+if errores_datos:
+    with st.sidebar.expander(f"⚠️ Archivos no cargados o incompletos ({len(errores_datos)})"):
+        for error in errores_datos:
+            st.caption(error)
+
+# Energía y flujos quedan como vistas por escenario del almacén compartido;
+# solo se concatenan los frames pequeños (métricas, resúmenes e histogramas)
+energia_parts = {escenario: df for escenario, df in data_parts['energia'].items() if not df.empty}
+flujos_parts = data_parts['flujos']
+df_metricas = concat_scenarios(data_parts['metricas'], scenarios_to_load, SCENARIO_KEYS)
+df_metricas = df_metricas.sort_values(SCENARIO_KEYS, ignore_index=True)
+df_histograms = concat_scenarios(data_parts['histogramas'], scenarios_to_load, HIST_COLUMNS)
+df_energia_summary = get_energy_summary(concat_scenarios(
+    {escenario: df[['Escenario_Completo', 'Escenario', 'Tipo', 'Energia_Consumida(J)']] for escenario, df in energia_parts.items()},
+    scenarios_to_load, ['Escenario_Completo', 'Escenario', 'Tipo', 'Energia_Consumida(J)']
+))
+
+# Versión de los datos (marcas de los archivos de los escenarios a cargar) para las claves de las cachés;
+# solo se consultan esos archivos, no todo el registro
+data_version = files_version(
+    scenario_registry.loc[scenario_registry['Escenario_Completo'].isin(scenarios_to_load), 'Archivo']
+)
 
-# --- Pestañas de Navegación ---
-tab_comparativa, tab_distribucion, tab_simulacion, tab_animacion, tab_resumen = st.tabs([
-    "📈 Métricas Clave y KPIs",
-    "📉 Distribución de Retardo/Jitter",
-    "⚡ Análisis de Consumo de Energía",
-    "📽️ Animación de Nodos",
-    "📝 Resumen Ejecutivo"
-])
+# Medias e intervalos de confianza de las réplicas, para las barras de error
+if aggregate_runs:
+    df_replicas, errores_replicas = profiled(
+        'Agregación de réplicas', load_replicate_stats, scenario_registry, tuple(selected_scenarios), data_version
+    )
+    df_replica_bars = replicate_error_bars(df_replicas)
+
+def cached_figure(chart, params, build):
+    """Figura memorizada por (gráfico, versión de datos, escenarios, réplicas, parámetros).
+
+    En un acierto se reutiliza la figura ya construida (en esta u otra sesión)
+    y ``build`` no se llama. En el modo en vivo siempre se construye.
+    """
+    if load_mode == "En vivo":
+        # Los datos cambian en cada sondeo y pueden ir por detrás de las marcas de los archivos
+        return build()
+    key = (chart, data_version, tuple(selected_scenarios), aggregate_runs, params)
+    with stage(f'figura:{chart}'):
+        return figure_cache().get_or_build(key, build)
+
+def error_bars(metric):
+    """Columna con el semiancho del intervalo de confianza de una métrica (None sin réplicas)."""
+    return f'{metric} IC' if aggregate_runs else None
+
+def load_selected_netanim():
+    """Animaciones por escenario de los seleccionados; solo se cargan al abrir su pestaña."""
+    if load_mode == "Incremental":
+        store = incremental_results(('ANIM',))
+        store.refresh()
+        parts, errores = store.scenario_parts()
+        return {escenario: parts['animacion'][escenario] for escenario in selected_scenarios if escenario in parts['animacion']}, errores
+    parts, errores = shared_store().get('animacion', selected_scenarios)
+    return parts['animacion'], errores
+
+# Cubo modo x tipo x métrica y KPIs globales (datos sin filtrar para la comparativa S vs NS)
+comparison_cube = ComparisonCube.from_summaries(df_energia_summary, df_metricas)
+kpis = compute_kpis(df_energia_summary, df_metricas, cube=comparison_cube)
+
+# Filtro de DataFrames Globales
+df_metricas_filtered = df_metricas[scenario_mask(df_metricas['Escenario_Completo'], selected_scenarios)]
+df_energia_summary_filtered = df_energia_summary[scenario_mask(df_energia_summary['Escenario_Completo'], selected_scenarios)]
 
 
 # --- Pestaña 1: Comparativa de Métricas Clave y KPIs ---
-with tab_comparativa:
+@instrumented()
+def render_comparativa():
+    """Pestaña de KPIs, tabla de métricas y gráficos comparativos."""
     st.header("Análisis de Rendimiento: Retardo, Paquetes y Sobrecarga")
 
     if df_metricas_filtered.empty:
@@ -98,22 +430,14 @@ with tab_comparativa:
         # --- Implementación de KPIs ---
         st.subheader("Indicadores Clave de Rendimiento (KPIs)")
         
-        # Encontrar los valores para los KPIs (Se usan datos sin filtrar para la comparativa S vs NS Ataque)
-        energy_attack_S = df_energia_summary[df_energia_summary['Escenario_Completo'] == 'S_con_Seguridad - Ataque']['Energia_Promedio(J)'].values
-        energy_attack_NS = df_energia_summary[df_energia_summary['Escenario_Completo'] == 'NS_sin_Seguridad - Ataque']['Energia_Promedio(J)'].values
-        lost_ns_attack = df_metricas[df_metricas['Escenario_Completo'] == 'NS_sin_Seguridad - Ataque']['Paquetes_Perdidos'].sum()
-        
         col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
         
         # KPI 1: Efectividad de la Seguridad (Ahorro de Energía)
-        if energy_attack_S.size > 0 and energy_attack_NS.size > 0 and energy_attack_NS[0] > 0:
-            diff = energy_attack_NS[0] - energy_attack_S[0]
-            pct_saving = (diff / energy_attack_NS[0]) * 100
-            
+        if not pd.isna(kpis['Ahorro_Energia_Ataque (%)']):
             col_kpi1.metric(
                 label="Ahorro de Energía bajo Ataque (S vs NS)",
-                value=f"{diff:.2f} J",
-                delta=f"Efectividad: {pct_saving:.1f}%"
+                value=f"{kpis['Ahorro_Energia_Ataque (J)']:.2f} J",
+                delta=f"Efectividad: {kpis['Ahorro_Energia_Ataque (%)']:.1f}%"
             )
         else:
              col_kpi1.metric(label="Ahorro de Energía bajo Ataque", value="N/A", delta="Faltan datos de Ataque")
@@ -121,7 +445,7 @@ with tab_comparativa:
         # KPI 2: Paquetes Perdidos bajo Ataque NS (Riesgo máximo)
         col_kpi2.metric(
             label="Paquetes Perdidos Sin Seguridad (Ataque)",
-            value=f"{lost_ns_attack}",
+            value=f"{kpis['Paquetes_Perdidos_NS_Ataque']}",
         )
         
         # KPI 3: Peor Retardo Promedio
@@ -136,101 +460,185 @@ with tab_comparativa:
         else:
             col_kpi3.metric(label="Peor Retardo Promedio (s)", value="0.0000 s")
 
+        startup_profile.append(('Primer KPI (desde el inicio del script)', time.perf_counter() - _script_start))
+
 
         st.markdown("---")
-        st.subheader("Tabla de Métricas de Rendimiento por Flow (ID 1)")
+        st.subheader("Tabla de Métricas de Rendimiento (Todos los Flujos)")
         
         # Muestra la tabla de métricas (renombrada para mejor UX)
+        metricas_labels = {
+            'Retardo_Sum (s)': 'Retardo Total (s)', 
+            'Jitter_Sum (s)': 'Jitter Total (s)',
+            'Retardo_Promedio (s)': 'Retardo Promedio (s)',
+            'Jitter_Promedio (s)': 'Jitter Promedio (s)',
+            'Bytes_x_Paquete': 'Sobrecarga (Bytes/Paquete)',
+            'Paquetes_TX': 'Paquetes Enviados',
+            'Paquetes_RX': 'Paquetes Recibidos',
+            'Paquetes_Perdidos': 'Paquetes Perdidos'
+        }
         st.dataframe(
-            df_metricas_filtered.rename(columns={
-                'Retardo_Sum (s)': 'Retardo Total (s)', 
-                'Jitter_Sum (s)': 'Jitter Total (s)',
-                'Retardo_Promedio (s)': 'Retardo Promedio (s)',
-                'Jitter_Promedio (s)': 'Jitter Promedio (s)',
-                'Bytes_x_Paquete': 'Sobrecarga (Bytes/Paquete)',
-                'Paquetes_RX': 'Paquetes Recibidos',
-                'Paquetes_Perdidos': 'Paquetes Perdidos'
-            }), 
+            df_metricas_filtered.rename(columns=metricas_labels), 
             hide_index=True, 
             width='stretch'
         )
         
+        # Reagrupación interactiva de los flujos por campos de la 5-tupla
+        group_label = st.selectbox("Agrupar flujos por", list(FLOW_GROUP_OPTIONS))
+        group_by = list(dict.fromkeys(['Escenario_Completo', FLOW_GROUP_OPTIONS[group_label]]))
+        # Se agrega cada escenario sobre su vista compartida, sin concatenar los flujos
+        df_grouped = pd.concat([
+            aggregate_flows(flujos_parts[escenario], by=group_by)
+            for escenario in selected_scenarios if escenario in flujos_parts
+        ] or [aggregate_flows(pd.DataFrame(columns=FLUJOS_COLUMNS), by=group_by)], ignore_index=True)
+        st.dataframe(
+            df_grouped.rename(columns=metricas_labels),
+            hide_index=True,
+            width='stretch'
+        )
+
+        # Detalle de un flujo, leído del XML por su rango de bytes (índice auxiliar)
+        with st.expander("Detalle de un flujo"):
+            flow_files = registry_files(scenario_registry, 'METRICAS', selected_scenarios)
+            if flow_files.empty:
+                st.caption("No hay archivos FlowMonitor para los escenarios seleccionados.")
+            else:
+                col_f1, col_f2 = st.columns(2)
+                flow_scenario = col_f1.selectbox(
+                    "Escenario del flujo", flow_files['Escenario_Completo'].unique().tolist(), key="escenario_flujo"
+                )
+                flow_id = int(col_f2.number_input("flowId", min_value=1, step=1, key="flujo_id"))
+                flow_file = flow_files.loc[flow_files['Escenario_Completo'] == flow_scenario, 'Archivo'].iloc[0]
+                index = profiled('Índice FlowMonitor', flowmonitor_index, flow_file)
+                flow = read_flow_elements(flow_file, flow_id, 'FlowStats', index)
+                if not flow:
+                    st.info(f"El flujo {flow_id} no está en {os.path.basename(flow_file)}.")
+                else:
+                    classifier = (read_flow_elements(flow_file, flow_id, 'Ipv4FlowClassifier', index)
+                                  or read_flow_elements(flow_file, flow_id, 'Ipv6FlowClassifier', index))
+                    attrs = {**(classifier[0].attrib if classifier else {}), **flow[0].attrib}
+                    st.dataframe(
+                        pd.DataFrame({'Atributo': list(attrs), 'Valor': list(attrs.values())}),
+                        hide_index=True, width='stretch'
+                    )
+                    probes = read_flow_elements(flow_file, flow_id, 'FlowProbes', index)
+                    if probes:
+                        st.caption(f"Paso del flujo por {len(probes)} sondas (FlowProbes).")
+                        st.dataframe(pd.DataFrame([probe.attrib for probe in probes]), hide_index=True, width='stretch')
+        
+        # Con réplicas agregadas, las barras son medias entre ejecuciones con su intervalo de confianza
+        df_bars = df_replica_bars if aggregate_runs else df_metricas_filtered
+        if aggregate_runs:
+            with st.expander(f"Réplicas: medias, IC del {REPLICATE_CONFIDENCE:.0%} y percentiles bootstrap"):
+                for error in errores_replicas:
+                    st.caption(f"⚠️ {error}")
+                st.dataframe(df_replicas, hide_index=True, width='stretch')
+
+        px = plotly_express()
         col_g1, col_g2 = st.columns(2)
         
         # Gráfico 1: Retardo Promedio (Nuevo)
         with col_g1:
-            fig_delay_avg = px.bar(
-                df_metricas_filtered, 
+            fig_delay_avg = cached_figure('retardo_promedio', (), lambda: px.bar(
+                df_bars, 
                 x='Escenario_Completo', 
                 y='Retardo_Promedio (s)', 
+                error_y=error_bars('Retardo_Promedio (s)'),
                 color='Escenario_Completo',
                 title='Retardo Promedio por Paquete (Segundos)',
                 labels={'Retardo_Promedio (s)': 'Retardo Promedio (s)', 'Escenario_Completo': 'Escenario'}
-            )
+            ))
             st.plotly_chart(fig_delay_avg, width='stretch')
 
         # Gráfico 2: Jitter Promedio (Nuevo)
         with col_g2:
-            fig_jitter_avg = px.bar(
-                df_metricas_filtered, 
+            fig_jitter_avg = cached_figure('jitter_promedio', (), lambda: px.bar(
+                df_bars, 
                 x='Escenario_Completo', 
                 y='Jitter_Promedio (s)', 
+                error_y=error_bars('Jitter_Promedio (s)'),
                 color='Escenario_Completo',
                 title='Jitter Promedio por Paquete (Segundos)',
                 labels={'Jitter_Promedio (s)': 'Jitter Promedio (s)', 'Escenario_Completo': 'Escenario'}
-            )
+            ))
             st.plotly_chart(fig_jitter_avg, width='stretch')
             
         col_g3, col_g4 = st.columns(2)
 
         # Gráfico 3: Paquetes Perdidos (Nuevo)
         with col_g3:
-            fig_lost = px.bar(
-                df_metricas_filtered, 
+            fig_lost = cached_figure('paquetes_perdidos', (), lambda: px.bar(
+                df_bars, 
                 x='Escenario_Completo', 
                 y='Paquetes_Perdidos', 
+                error_y=error_bars('Paquetes_Perdidos'),
                 color='Escenario_Completo',
                 title='Paquetes Perdidos',
                 labels={'Paquetes_Perdidos': 'Cantidad de Paquetes Perdidos', 'Escenario_Completo': 'Escenario'}
-            )
+            ))
             st.plotly_chart(fig_lost, width='stretch')
 
         # Gráfico 4: Sobrecarga/Overhead
         with col_g4:
-            fig_overhead = px.bar(
-                df_metricas_filtered, 
+            fig_overhead = cached_figure('sobrecarga', (), lambda: px.bar(
+                df_bars, 
                 x='Escenario_Completo', 
                 y='Bytes_x_Paquete', 
+                error_y=error_bars('Bytes_x_Paquete'),
                 color='Escenario_Completo',
                 title='Sobrecarga (Bytes/Paquete)',
                 labels={'Bytes_x_Paquete': 'Bytes por Paquete (Overhead)', 'Escenario_Completo': 'Escenario'}
-            )
+            ))
             st.plotly_chart(fig_overhead, width='stretch')
 
+        render_ventana_ataque()
+
+def render_ventana_ataque():
+    """Carga ofrecida/entregada y pérdidas en el tiempo, reconstruidas de los tiempos de los flujos."""
+    st.markdown("---")
+    st.subheader("Evolución Temporal de la Carga y las Pérdidas")
+    parts = {escenario: flujos_parts[escenario] for escenario in selected_scenarios
+             if escenario in flujos_parts and not flujos_parts[escenario].empty}
+    if not parts:
+        st.info("No hay flujos para los escenarios seleccionados.")
+        return
+
+    col_t1, col_t2 = st.columns(2)
+    series_label = col_t1.selectbox("Serie temporal", list(FLOW_SERIES_OPTIONS), key="serie_flujos")
+    n_bins = col_t2.slider("Intervalos de tiempo", 20, 1000, FLOW_SERIES_BINS, step=10, key="intervalos_flujos")
+    column = FLOW_SERIES_OPTIONS[series_label]
+
+    # Las series solo se reconstruyen si la figura no está en la caché
+    fig_series, onsets = cached_figure(
+        'serie_flujos', (column, n_bins), lambda: build_flow_series_figure(parts, column, series_label, n_bins)
+    )
+    st.plotly_chart(fig_series, width='stretch')
+    st.caption(f"Inicio de pérdidas ≥ {FLOW_LOSS_THRESHOLD:g}%: " + "; ".join(
+        f"{escenario}: {'no lo alcanza' if pd.isna(t) else f't = {t:.2f} s'}" for escenario, t in onsets.items()
+    ))
+
 # --- Pestaña 2: Distribución de Retardo/Jitter (NUEVA) ---
-with tab_distribucion:
+@instrumented()
+def render_distribucion():
+    """Pestaña de histogramas y CDF de retardo/jitter."""
     st.header("📉 Distribución de Frecuencia de Retardo y Jitter")
     st.info("Estos gráficos muestran la frecuencia (conteo) con la que los valores de retardo y jitter caen dentro de rangos específicos (bins).")
 
-    df_hist_filtered = df_histograms[df_histograms['Escenario_Completo'].isin(selected_scenarios)]
+    hist_resolution = st.radio("Resolución de los bins", list(HIST_RESOLUTIONS), horizontal=True)
+    hist_factor, hist_bins_per_decade = HIST_RESOLUTIONS[hist_resolution]
+    # El reescalado y la CDF se hacen dentro de la construcción: en un acierto de la caché no se repiten
+    fig_delay_hist, fig_jitter_hist, fig_delay_cdf = cached_figure(
+        'distribucion', (hist_resolution,), lambda: build_distribution_figures(
+            df_histograms[scenario_mask(df_histograms['Escenario_Completo'], selected_scenarios)],
+            hist_factor, hist_bins_per_decade
+        )
+    )
 
-    if df_hist_filtered.empty:
+    if fig_delay_hist is None and fig_jitter_hist is None:
         st.warning("No hay datos de histograma disponibles para los escenarios seleccionados.")
     else:
         # Gráfico de Histograma de Retardo
-        df_delay_hist = df_hist_filtered[df_hist_filtered['Métrica'] == 'Delay']
-        
-        if not df_delay_hist.empty:
-            fig_delay_hist = px.bar(
-                df_delay_hist,
-                x='Rango_Inicio (s)',
-                y='Conteo',
-                color='Escenario_Completo',
-                barmode='group',
-                title='Histograma de Retardo de Paquetes (Segundos)',
-                labels={'Rango_Inicio (s)': 'Rango de Retardo (s)', 'Conteo': 'Conteo de Paquetes'}
-            )
-            fig_delay_hist.update_xaxes(type='category')
+        if fig_delay_hist is not None:
             st.plotly_chart(fig_delay_hist, width='stretch')
         else:
              st.info("No hay datos de Histograma de Retardo disponibles.")
@@ -238,26 +646,55 @@ with tab_distribucion:
         st.markdown("---")
 
         # Gráfico de Histograma de Jitter
-        df_jitter_hist = df_hist_filtered[df_hist_filtered['Métrica'] == 'Jitter']
-        
-        if not df_jitter_hist.empty:
-            fig_jitter_hist = px.bar(
-                df_jitter_hist,
-                x='Rango_Inicio (s)',
-                y='Conteo',
-                color='Escenario_Completo',
-                barmode='group',
-                title='Histograma de Jitter de Paquetes (Segundos)',
-                labels={'Rango_Inicio (s)': 'Rango de Jitter (s)', 'Conteo': 'Conteo de Paquetes'}
-            )
-            fig_jitter_hist.update_xaxes(type='category')
+        if fig_jitter_hist is not None:
             st.plotly_chart(fig_jitter_hist, width='stretch')
         else:
              st.info("No hay datos de Histograma de Jitter disponibles.")
 
+        st.markdown("---")
+
+        # Gráfico de la Distribución Acumulada (CDF) de Retardo
+        if fig_delay_cdf is not None:
+            st.plotly_chart(fig_delay_cdf, width='stretch')
+
+    render_retardo_por_salto()
+
+def render_retardo_por_salto():
+    """Sondas (nodos) que más retardo añaden a los flujos, a partir de FlowProbes."""
+    st.markdown("---")
+    st.subheader("Retardo por Salto (FlowProbes)")
+    probe_parts, errores_sondas = profiled('Sondas FlowProbes', shared_store().get, 'sondas', selected_scenarios)
+    probe_parts = {escenario: df for escenario, df in probe_parts['sondas'].items() if not df.empty}
+    for error in errores_sondas:
+        st.caption(f"⚠️ {error}")
+    if not probe_parts:
+        st.info("No hay datos de FlowProbes para los escenarios seleccionados.")
+        return
+
+    # Por defecto el primer escenario con ataque, que es donde interesa el retardo añadido
+    options = list(probe_parts)
+    default = next((i for i, escenario in enumerate(options) if 'Ataque' in escenario), 0)
+    selected_probe_scenario = st.selectbox("Escenario de las sondas", options, index=default, key="escenario_sondas")
+    df_contribution = probe_delay_contribution(probe_parts[selected_probe_scenario])
+    top_n = st.slider("Sondas mostradas", 1, max(2, len(df_contribution)), min(10, len(df_contribution)), key="sondas_mostradas")
+    df_top = df_contribution.head(top_n)
+
+    fig_hops = cached_figure('retardo_por_salto', (selected_probe_scenario, top_n), lambda: plotly_express().bar(
+        df_top.assign(Sonda=df_top['Sonda'].astype(str)),
+        x='Sonda',
+        y='Retardo_Salto_Total (s)',
+        hover_data=['Flujos', 'Paquetes', 'Retardo_Salto_Medio (s)', 'Contribución (%)'],
+        title='Retardo Añadido por Sonda (suma sobre los paquetes)',
+        labels={'Sonda': 'Sonda (nodo)', 'Retardo_Salto_Total (s)': 'Retardo añadido (s)'}
+    ).update_xaxes(type='category'))
+    st.plotly_chart(fig_hops, width='stretch')
+    st.dataframe(df_top, hide_index=True, width='stretch')
+
 
 # --- Pestaña 3: Análisis de Consumo de Energía ---
-with tab_simulacion:
+@instrumented()
+def render_simulacion():
+    """Pestaña de consumo de energía por escenario y por nodo."""
     st.header("⚡ Análisis de Consumo de Energía")
     
     # Tabla Resumen (filtrada)
@@ -268,26 +705,28 @@ with tab_simulacion:
         width='stretch'
     )
     
+    px = plotly_express()
     col3, col4 = st.columns(2)
     
     # Gráfico de Consumo Promedio
     with col3:
-        fig_energy = px.bar(
-            df_energia_summary_filtered, 
+        fig_energy = cached_figure('energia_promedio', (), lambda: px.bar(
+            df_replica_bars if aggregate_runs else df_energia_summary_filtered, 
             x='Escenario_Completo', 
             y='Energia_Promedio(J)', 
+            error_y=error_bars('Energia_Promedio(J)'),
             color='Escenario_Completo',
             title='Consumo de Energía Promedio por Nodo (Julios)',
             labels={'Energia_Promedio(J)': 'Energía Promedio Consumida (J)', 'Escenario_Completo': 'Escenario'}
-        )
+        ))
         st.plotly_chart(fig_energy, width='stretch')
         
     # Gráfico de Consumo por Nodo (Interactiva - Simulable)
     with col4:
         st.subheader("Visualización Detallada por Nodo")
         
-        if not df_energia.empty:
-            scenario_options = df_energia['Escenario_Completo'].unique().tolist()
+        if energia_parts:
+            scenario_options = [escenario for escenario in scenarios_to_load if escenario in energia_parts]
             if not scenario_options:
                 st.warning("No hay datos de energía para graficar el detalle por nodo.")
             else:
@@ -296,33 +735,86 @@ with tab_simulacion:
                     scenario_options
                 )
                 
-                filtered_df = df_energia[
-                    df_energia['Escenario_Completo'] == selected_detail_scenario
-                ]
+                filtered_df = energia_parts[selected_detail_scenario]
                 
-                fig_node_energy = px.line(
+                fig_node_energy = cached_figure('energia_por_nodo', (selected_detail_scenario,), lambda: px.line(
                     filtered_df, 
                     x='Nodo_ID', 
                     y='Energia_Consumida(J)', 
                     title=f'Consumo de Energía por Nodo - {selected_detail_scenario}',
                     labels={'Energia_Consumida(J)': 'Energía Consumida (J)', 'Nodo_ID': 'ID del Nodo'}
-                )
+                ))
                 st.plotly_chart(fig_node_energy, width='stretch')
         else:
             st.warning("No hay datos de energía cargados para simular.")
 
+    # Trazas de energía en el tiempo (Tiempo(s), Nodo_ID, Energia_Restante(J))
+    trace_parts, errores_trazas = profiled('Trazas de energía', shared_store().get, 'trazas', selected_scenarios)
+    trace_parts = {escenario: df for escenario, df in trace_parts['trazas'].items() if not df.empty}
+    for error in errores_trazas:
+        st.caption(f"⚠️ {error}")
+    if not trace_parts:
+        return
+
+    st.markdown("---")
+    st.subheader("Evolución de la Energía Restante en el Tiempo")
+    selected_trace_scenario = st.selectbox(
+        "Selecciona el Escenario de la Traza",
+        list(trace_parts)
+    )
+    df_trace = trace_parts[selected_trace_scenario]
+
+    # Por defecto, los nodos con menos energía restante al final de la traza
+    final_energy = df_trace.groupby('Nodo_ID', sort=True)['Energia_Restante(J)'].last()
+    trace_nodes = st.multiselect(
+        "Nodos a graficar",
+        final_energy.index.tolist(),
+        default=final_energy.nsmallest(TRACE_DEFAULT_NODES).index.tolist()
+    )
+    trace_method = st.radio("Reducción de puntos", list(TRACE_DOWNSAMPLING), horizontal=True)
+
+    # La reducción de puntos y la envolvente se hacen dentro de la construcción de las figuras
+    fig_trace, n_points = cached_figure(
+        'traza_energia', (selected_trace_scenario, tuple(trace_nodes), trace_method),
+        lambda: build_trace_figure(
+            df_trace, trace_nodes, TRACE_DOWNSAMPLING[trace_method],
+            f'Energía Restante por Nodo - {selected_trace_scenario}'
+        )
+    )
+    st.caption(f"{len(df_trace):,} muestras de {len(final_energy):,} nodos; se dibujan {n_points:,} puntos.")
+
+    col5, col6 = st.columns(2)
+    with col5:
+        st.plotly_chart(fig_trace, width='stretch')
+
+    # Envolvente de todos los nodos (mínimo, promedio y máximo por intervalo)
+    with col6:
+        fig_envelope = cached_figure(
+            'envolvente_energia', (selected_trace_scenario,), lambda: build_envelope_figure(df_trace)
+        )
+        st.plotly_chart(fig_envelope, width='stretch')
+
 
 # --- Pestaña 4: Animación de Nodos Interactiva ---
-with tab_animacion:
+@instrumented()
+def render_animacion():
+    """Pestaña de animación; carga los archivos NetAnim al abrirse."""
     st.header("📽️ Visualización Dinámica de Movimiento de Nodos")
+
+    netanim_parts, errores_anim = profiled('Animaciones NetAnim', load_selected_netanim)
+    netanim_parts = {escenario: df for escenario, df in netanim_parts.items() if not df.empty}
+    if errores_anim:
+        with st.expander(f"⚠️ Archivos de animación no cargados ({len(errores_anim)})"):
+            for error in errores_anim:
+                st.caption(error)
     
-    if df_netanim.empty:
+    if not netanim_parts:
         st.warning("⚠️ No se pudo cargar ningún archivo de animación XML. Asegúrate de que los archivos NetAnim estén en el directorio correcto.")
     else:
         st.info("Simulación del movimiento de la topología usando Plotly. El eje de tiempo (Time) en la parte inferior controla la animación.")
         
         # Controles de Simulación
-        scenario_options_anim = df_netanim['Escenario_Completo'].unique().tolist()
+        scenario_options_anim = list(netanim_parts)
         if not scenario_options_anim:
             st.warning("No hay escenarios de animación disponibles.")
         else:
@@ -331,41 +823,68 @@ with tab_animacion:
                 scenario_options_anim
             )
             
-            filtered_anim_df = df_netanim[df_netanim['Escenario_Completo'] == selected_anim_scenario].copy()
+            anim_fps = st.slider(
+                "Fotogramas por segundo simulado",
+                min_value=1, max_value=30, value=10
+            )
             
-            if not filtered_anim_df.empty:
-                # Crear la animación de dispersión (Scatter Plot)
-                fig_anim = px.scatter(
-                    filtered_anim_df, 
-                    x='X', 
-                    y='Y', 
-                    animation_frame='Time',
-                    color='Node_ID', 
-                    hover_name='Node_ID',
-                    size=[15]*len(filtered_anim_df), 
-                    range_x=[filtered_anim_df['X'].min() - 5, filtered_anim_df['X'].max() + 5],
-                    range_y=[filtered_anim_df['Y'].min() - 5, filtered_anim_df['Y'].max() + 5],
-                    title=f"Animación de Topología: {selected_anim_scenario}",
-                    labels={'X': 'Coordenada X', 'Y': 'Coordenada Y'}
-                )
-                
-                fig_anim.update_layout(
-                    transition={'duration': 100},
-                    yaxis = {'scaleanchor':"x", 'scaleratio':1},
-                    margin=dict(t=50, b=50, l=50, r=50)
-                )
-                
-                if fig_anim.layout.updatemenus:
-                    fig_anim.layout.updatemenus[0].buttons[0].args[1]['frame']['duration'] = 100 
-                    fig_anim.layout.updatemenus[0].buttons[0].args[1]['transition']['duration'] = 50
-
+            df_anim_events = netanim_parts[selected_anim_scenario]
+            
+            if not df_anim_events.empty:
+                # Crear la animación de dispersión (Scatter Plot) sobre fotogramas remuestreados
+                fig_anim, n_frames, shown_nodes, n_nodes = cached_figure('animacion', (selected_anim_scenario, anim_fps), lambda: build_animation_figure(
+                    df_anim_events, anim_fps, f"Animación de Topología: {selected_anim_scenario}"
+                ))
+                st.caption(f"{n_frames} fotogramas interpolados (máximo {ANIM_MAX_FRAMES}).")
+                if shown_nodes < n_nodes:
+                    st.caption(f"Se muestran {shown_nodes} de {n_nodes} nodos (muestra regular) para no superar el presupuesto de la animación.")
                 st.plotly_chart(fig_anim, width='stretch')
+                render_mapa_espacial(selected_anim_scenario, df_anim_events)
             else:
                 st.warning("No hay datos de movimiento disponibles para el escenario seleccionado.")
 
 
+def render_mapa_espacial(escenario, df_anim_events):
+    """Mapa de calor de la energía por celda y nodos en un radio, con el índice espacial."""
+    st.markdown("---")
+    st.subheader("Mapa de Calor de Energía y Consultas por Región")
+    df_energy = energia_parts.get(escenario, pd.DataFrame(columns=['Nodo_ID', 'Energia_Consumida(J)']))
+    version = (data_version, len(df_anim_events), float(df_anim_events['Time'].max()), len(df_energy))
+    index = profiled('Índice espacial', spatial_index, escenario, version, df_anim_events, df_energy)
+    if df_energy.empty:
+        st.caption("⚠️ No hay reporte de energía para este escenario; el mapa se muestra vacío.")
+
+    instante = st.select_slider(
+        "Instante (s)", options=index.times.tolist(), value=float(index.times[-1]), key="instante_espacial"
+    )
+    fig_heatmap = cached_figure('mapa_energia', (escenario, instante), lambda: build_energy_heatmap(index, instante))
+    st.plotly_chart(fig_heatmap, width='stretch')
+
+    # Nodos en un radio alrededor de un nodo (p. ej. el atacante) en el instante elegido
+    df_positions = index.positions_at(instante)
+    col_s1, col_s2 = st.columns(2)
+    center_node = col_s1.selectbox(
+        "Nodo central (p. ej. el atacante)", sorted(df_positions['Node_ID'].tolist()), key="nodo_central"
+    )
+    max_radius = float(index.cell_size * max(index.nx, index.ny))
+    radius = col_s2.slider("Radio", 0.0, max_radius, min(2 * index.cell_size, max_radius), key="radio_espacial")
+    position = index.node_position(center_node, instante)
+    if position is None:
+        return
+    start = time.perf_counter()
+    df_near = index.within_radius(*position, radius, instante)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    st.caption(
+        f"{len(df_near)} nodos a distancia ≤ {radius:.1f} del nodo {center_node}; "
+        f"consumieron {df_near['Energia_Consumida(J)'].sum():.2f} J (consulta en {elapsed_ms:.2f} ms)."
+    )
+    st.dataframe(df_near, hide_index=True, width='stretch')
+
+
 # --- Pestaña 5: Resumen Ejecutivo y Conclusión ---
-with tab_resumen:
+@instrumented()
+def render_resumen():
+    """Pestaña del resumen ejecutivo a partir de los KPIs."""
     st.header("📝 Resumen Ejecutivo y Conclusión")
     st.markdown("El análisis detallado del rendimiento y consumo de energía permite extraer las siguientes conclusiones clave:")
     
@@ -373,21 +892,14 @@ with tab_resumen:
     st.success("La seguridad en el caso base (sin ataque) tiene un **costo operacional bajo**:")
     
     # Cálculos de Sobrecarga
-    df_base = df_metricas[df_metricas['Tipo'] == 'Base']
-    avg_overhead_s = df_base[df_base['Escenario'] == 'S_con_Seguridad']['Bytes_x_Paquete'].mean()
-    avg_overhead_ns = df_base[df_base['Escenario'] == 'NS_sin_Seguridad']['Bytes_x_Paquete'].mean()
-    overhead_diff = avg_overhead_s - avg_overhead_ns if not pd.isna(avg_overhead_s) and not pd.isna(avg_overhead_ns) else 0
+    overhead_diff = kpis['Sobrecarga_Seguridad (Bytes)']
+    overhead_diff = 0 if pd.isna(overhead_diff) else overhead_diff
 
     st.markdown(f"* **Sobrecarga (Overhead):** La seguridad añade $\\approx **{overhead_diff:.0f} bytes**$ por paquete (comparando S\_Base vs NS\_Base).")
     
     # Cálculos de Energía
-    energy_base_s = df_energia_summary[df_energia_summary['Escenario_Completo'] == 'S_con_Seguridad - Base']['Energia_Promedio(J)'].values
-    energy_base_ns = df_energia_summary[df_energia_summary['Escenario_Completo'] == 'NS_sin_Seguridad - Base']['Energia_Promedio(J)'].values
-
-    if energy_base_s.size > 0 and energy_base_ns.size > 0 and energy_base_ns[0] > 0:
-        energy_diff = energy_base_s[0] - energy_base_ns[0]
-        energy_pct = (energy_diff / energy_base_ns[0]) * 100
-        st.markdown(f"* **Energía:** Solo $\\approx **{energy_pct:.1f}\\%**$ de aumento en el consumo promedio por nodo.")
+    if not pd.isna(kpis['Aumento_Energia_Base (%)']):
+        st.markdown(f"* **Energía:** Solo $\\approx **{kpis['Aumento_Energia_Base (%)']:.1f}\\%**$ de aumento en el consumo promedio por nodo.")
     else:
         st.markdown("* **Energía:** No hay datos de energía base para el cálculo de comparación.")
         
@@ -395,21 +907,79 @@ with tab_resumen:
     st.error("El ataque (probablemente DoS de agotamiento de recursos) impacta críticamente el escenario no seguro:")
     
     # Cálculos de Ataque
-    energy_attack_S_val = energy_attack_S[0] if energy_attack_S.size > 0 else 0
-    energy_attack_NS_val = energy_attack_NS[0] if energy_attack_NS.size > 0 else 0
-    lost_s_attack = df_metricas[df_metricas['Escenario_Completo'] == 'S_con_Seguridad - Ataque']['Paquetes_Perdidos'].sum()
-    lost_ns_attack = df_metricas[df_metricas['Escenario_Completo'] == 'NS_sin_Seguridad - Ataque']['Paquetes_Perdidos'].sum()
+    energy_attack_S_val = kpis['Energia_S_Ataque (J)']
+    energy_attack_NS_val = kpis['Energia_NS_Ataque (J)']
     
-    if energy_attack_S_val > 0 and energy_attack_NS_val > 0 and energy_base_ns.size > 0 and energy_base_s.size > 0:
-        factor_increase_ns = energy_attack_NS_val / energy_base_ns[0] if energy_base_ns[0] > 0 else float('inf')
-        factor_increase_s = energy_attack_S_val / energy_base_s[0] if energy_base_s[0] > 0 else float('inf')
-        
-        st.markdown(f"* **Sin Seguridad (NS - Ataque):** El consumo se dispara a $\\approx **{energy_attack_NS_val:.2f} J**$, un aumento de **{factor_increase_ns:.1f} veces** respecto a NS\_Base. Se registraron $\\mathbf{{lost_ns_attack}}$ paquetes perdidos.")
-        st.success(f"* **Con Seguridad (S - Ataque):** El consumo se mantiene controlado a $\\approx **{energy_attack_S_val:.2f} J**$, un aumento de solo **{factor_increase_s:.1f} veces** respecto a S\_Base. Paquetes perdidos: $\\mathbf{{lost_s_attack}}$")
+    if energy_attack_S_val > 0 and energy_attack_NS_val > 0 and not pd.isna(kpis['Factor_Ataque_S']) and not pd.isna(kpis['Factor_Ataque_NS']):
+        st.markdown(f"* **Sin Seguridad (NS - Ataque):** El consumo se dispara a $\\approx **{energy_attack_NS_val:.2f} J**$, un aumento de **{kpis['Factor_Ataque_NS']:.1f} veces** respecto a NS\_Base. Se registraron $\\mathbf{{{kpis['Paquetes_Perdidos_NS_Ataque']}}}$ paquetes perdidos.")
+        st.success(f"* **Con Seguridad (S - Ataque):** El consumo se mantiene controlado a $\\approx **{energy_attack_S_val:.2f} J**$, un aumento de solo **{kpis['Factor_Ataque_S']:.1f} veces** respecto a S\_Base. Paquetes perdidos: $\\mathbf{{{kpis['Paquetes_Perdidos_S_Ataque']}}}$")
         
+    # Comparación generalizada: todos los modos de seguridad y tipos de tráfico cargados
+    if comparison_cube.modes:
+        with st.expander("Comparación entre todos los modos y tipos de tráfico"):
+            cube_metric = st.selectbox("Métrica", list(CUBE_METRICS), key="metrica_cubo")
+            st.dataframe(comparison_cube.compare(cube_metric), hide_index=True, width='stretch')
+
     st.markdown("---")
     st.metric(
         label="Conclusión Principal", 
         value="La seguridad es **crítica y altamente efectiva**", 
         delta=f"La inversión previene una pérdida de energía catastrófica y garantiza un servicio estable bajo ataque."
-    )
\ No newline at end of file
+    )
+
+
+# --- Pestaña oculta: Rendimiento (instrumentación de loaders y gráficos) ---
+def render_rendimiento():
+    """Pestaña con las etapas medidas (buffer circular) y su exportación."""
+    st.header("⏱️ Rendimiento")
+    st.info("Tiempos, filas y bytes de cada loader y constructor de gráficos, de las ejecuciones más recientes.")
+
+    df_stages = stages_frame()
+    if df_stages.empty:
+        st.warning("Todavía no hay etapas registradas.")
+        return
+
+    st.subheader("Resumen por Etapa")
+    st.dataframe(stages_summary(df_stages), hide_index=True, width='stretch')
+
+    st.subheader("Caché de Figuras")
+    st.dataframe(pd.DataFrame([figure_cache().stats()]), hide_index=True, width='stretch')
+
+    st.subheader("Últimas Etapas")
+    df_recent = df_stages.iloc[::-1].copy()
+    df_recent['Inicio'] = pd.to_datetime(df_recent['Inicio'], unit='s')
+    st.dataframe(df_recent, hide_index=True, width='stretch')
+
+    col_json, col_prom, col_clear = st.columns(3)
+    col_json.download_button("Exportar JSON", export_json(), file_name='etapas.json', mime='application/json')
+    col_prom.download_button("Exportar Prometheus", export_prometheus(), file_name='etapas.prom', mime='text/plain')
+    if col_clear.button("Vaciar registros"):
+        clear_stages()
+        st.rerun()
+
+
+# --- Pestañas de Navegación ---
+# La pestaña "Rendimiento" solo aparece con el perfil activado
+tab_labels = [
+    "📈 Métricas Clave y KPIs",
+    "📉 Distribución de Retardo/Jitter",
+    "⚡ Análisis de Consumo de Energía",
+    "📽️ Animación de Nodos",
+    "📝 Resumen Ejecutivo",
+] + (["⏱️ Rendimiento"] if PROFILE_ENABLED else [])
+tabs = st.tabs(tab_labels, key="pestana", on_change="rerun")
+
+# Solo se ejecuta la pestaña abierta: Plotly y las animaciones se cargan al abrir la suya
+for tab, render in zip(tabs, [render_comparativa, render_distribucion, render_simulacion, render_animacion, render_resumen, render_rendimiento]):
+    if tab.open:
+        with tab:
+            render()
+
+# Perfil de arranque en la barra lateral
+if PROFILE_ENABLED:
+    startup_profile.append(('Total del script', time.perf_counter() - _script_start))
+    with st.sidebar.expander("⏱️ Perfil de arranque", expanded=True):
+        st.dataframe(
+            pd.DataFrame(startup_profile, columns=['Etapa', 'Segundos']).round(4),
+            hide_index=True, width='stretch'
+        )
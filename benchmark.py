@@ -0,0 +1,262 @@
+# benchmark.py
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from functools import partial
+
+import utils
+
+# Archivo donde se acumulan los resultados (una línea JSON por ejecución)
+RESULTS_FILE = 'benchmark_resultados.jsonl'
+
+# Nombres de archivo de ns-3 por escenario (S/NS x Base/Ataque)
+SCENARIO_FILES = {
+    ('S', False): ('S_reporte_energia.csv', 'S_metricas.xml', 'S_iot-animacion.xml'),
+    ('NS', False): ('NS_reporte_energia.csv', 'NS_metricas.xml', 'NS_iot-animacion.xml'),
+    ('S', True): ('S_reporte_energia_ATTK.csv', 'S_metricas-ATTK.xml', 'S_iot-animacion-ATTK.xml'),
+    ('NS', True): ('NS_reporte_energia_ATTK.csv', 'NS_metrica-ATTK.xml', 'NS_iot-animacion_ATTK.xml'),
+}
+
+def _ns(seconds):
+    """Formatea segundos como un tiempo de ns-3 ('+1.03021e+09ns')."""
+    return f'+{seconds * 1e9:.6g}ns'
+
+def generate_flowmonitor_xml(path, n_flows, n_bins, n_probes=8, seed=0):
+    """Escribe un FlowMonitor sintético con ``n_flows`` flujos y ``n_bins`` bins por histograma."""
+    rng = random.Random(seed)
+    with open(path, 'w') as fh:
+        fh.write('<?xml version="1.0" ?>\n<FlowMonitor>\n  <FlowStats>\n')
+        for flow_id in range(1, n_flows + 1):
+            tx = rng.randint(50, 500)
+            rx = tx - rng.randint(0, tx // 10)
+            first_tx = rng.uniform(1, 5)
+            last_rx = first_tx + rng.uniform(10, 50)
+            delay = rng.uniform(0.0005, 0.05)
+            fh.write(
+                f'    <Flow flowId="{flow_id}" timeFirstTxPacket="{_ns(first_tx)}" '
+                f'timeFirstRxPacket="{_ns(first_tx + delay)}" timeLastTxPacket="{_ns(last_rx - delay)}" '
+                f'timeLastRxPacket="{_ns(last_rx)}" delaySum="{_ns(delay * rx)}" '
+                f'jitterSum="{_ns(delay * rx / 10)}" lastDelay="{_ns(delay)}" maxDelay="{_ns(delay * 3)}" '
+                f'minDelay="{_ns(delay / 3)}" txBytes="{tx * 284}" rxBytes="{rx * 284}" txPackets="{tx}" '
+                f'rxPackets="{rx}" lostPackets="{tx - rx}" timesForwarded="{rx}">\n'
+            )
+            for tag in ('delay', 'jitter'):
+                fh.write(f'      <{tag}Histogram nBins="{n_bins}" >\n')
+                for index in sorted(rng.sample(range(n_bins * 2), n_bins)):
+                    fh.write(
+                        f'        <bin index="{index}" start="{index * 0.001:g}" width="0.001" '
+                        f'count="{rng.randint(1, 100)}" />\n'
+                    )
+                fh.write(f'      </{tag}Histogram>\n')
+            fh.write('      <packetSizeHistogram nBins="1" >\n')
+            fh.write('        <bin index="14" start="280" width="20" count="1" />\n')
+            fh.write('      </packetSizeHistogram>\n')
+            fh.write('      <flowInterruptionsHistogram nBins="0" >\n      </flowInterruptionsHistogram>\n')
+            fh.write('    </Flow>\n')
+        fh.write('  </FlowStats>\n  <Ipv4FlowClassifier>\n')
+        for flow_id in range(1, n_flows + 1):
+            fh.write(
+                f'    <Flow flowId="{flow_id}" sourceAddress="10.1.{flow_id // 250}.{flow_id % 250 + 1}" '
+                f'destinationAddress="10.1.2.2" protocol="17" sourcePort="49153" destinationPort="4000">\n'
+                f'      <Dscp value="0x0" packets="100" />\n    </Flow>\n'
+            )
+        fh.write('  </Ipv4FlowClassifier>\n  <Ipv6FlowClassifier>\n  </Ipv6FlowClassifier>\n  <FlowProbes>\n')
+        for probe in range(n_probes):
+            fh.write(f'    <FlowProbe index="{probe}">\n')
+            for flow_id in range(probe + 1, n_flows + 1, n_probes):
+                fh.write(
+                    f'      <FlowStats  flowId="{flow_id}" packets="100" bytes="28400" '
+                    f'delayFromFirstProbeSum="{_ns(rng.uniform(0, 1))}" >\n      </FlowStats>\n'
+                )
+            fh.write('    </FlowProbe>\n')
+        fh.write('  </FlowProbes>\n</FlowMonitor>\n')
+
+def generate_netanim_xml(path, n_nodes, n_moves, seed=0):
+    """Escribe una animación NetAnim sintética con ``n_nodes`` nodos y ``n_moves`` movimientos."""
+    rng = random.Random(seed)
+    with open(path, 'w') as fh:
+        fh.write('<?xml version="1.0" ?>\n<anim ver="netanim-3.108">\n')
+        for node_id in range(n_nodes):
+            fh.write(
+                f'<node id="{node_id}" sysId="0" locX="{rng.uniform(0, 500):.3f}" '
+                f'locY="{rng.uniform(0, 500):.3f}" />\n'
+            )
+        t = 0.0
+        for _ in range(n_moves):
+            t += rng.expovariate(10)
+            fh.write(
+                f'<move id="{rng.randrange(n_nodes)}" time="{t:.4f}" '
+                f'locX="{rng.uniform(0, 500):.3f}" locY="{rng.uniform(0, 500):.3f}" />\n'
+            )
+        fh.write('</anim>\n')
+
+def generate_energy_csv(path, n_nodes, seed=0):
+    """Escribe un reporte de energía sintético con una fila por nodo."""
+    rng = random.Random(seed)
+    with open(path, 'w') as fh:
+        fh.write('Nodo_ID,Energia_Inicial(J),Energia_Restante(J),Energia_Consumida(J)\n')
+        for node_id in range(n_nodes):
+            consumed = rng.uniform(1, 20)
+            fh.write(f'{node_id},50,{50 - consumed:.4f},{consumed:.5f}\n')
+
+def generate_energy_trace_csv(path, n_nodes, n_samples, seed=0):
+    """Escribe una traza de energía sintética con ``n_samples`` muestras por nodo."""
+    rng = random.Random(seed)
+    rates = [rng.uniform(0.01, 0.1) for _ in range(n_nodes)]
+    with open(path, 'w') as fh:
+        fh.write('Tiempo(s),Nodo_ID,Energia_Restante(J)\n')
+        for sample in range(n_samples):
+            t = sample * 0.5
+            fh.writelines(f'{t:g},{node_id},{50 - rate * t:.5f}\n' for node_id, rate in enumerate(rates))
+
+def generate_results_dir(root, n_flows, n_bins, n_nodes, n_moves):
+    """Genera los archivos de los cuatro escenarios en ``root``."""
+    for seed, (energy, metrics, anim) in enumerate(SCENARIO_FILES.values()):
+        generate_energy_csv(os.path.join(root, energy), n_nodes, seed)
+        generate_flowmonitor_xml(os.path.join(root, metrics), n_flows, n_bins, seed=seed)
+        generate_netanim_xml(os.path.join(root, anim), n_nodes, n_moves, seed)
+
+def measure(func, *args, repeats=1, setup=None, **kwargs):
+    """Mide el mejor tiempo y el pico de memoria (tracemalloc) de una llamada.
+
+    El tiempo se toma sin tracemalloc activo, que ralentiza cada asignación;
+    la memoria se mide en una ejecución adicional. ``setup`` se llama antes de
+    cada ejecución, fuera de la medición.
+    """
+    times = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'segundos': min(times), 'pico_memoria_MB': peak / 1024 / 1024}
+
+def _base_metrics_from_file(path):
+    """get_base_metrics incluye el parseo del DOM completo, como en su uso original."""
+    return utils.get_base_metrics(ET.parse(path).getroot(), 'benchmark')
+
+def _git_commit():
+    """Commit actual del repositorio, si está disponible."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def remove_index_sidecars(root):
+    """Borra los índices de bytes de los FlowMonitor, para medir una primera carga real."""
+    for name in os.listdir(root):
+        if name.endswith(utils.FLOWMONITOR_INDEX_SUFFIX):
+            os.remove(os.path.join(root, name))
+
+def build_index_sidecars(root):
+    """Crea los índices de bytes de todos los FlowMonitor (camino indexado de los loaders)."""
+    for _, metrics, _ in SCENARIO_FILES.values():
+        utils.flowmonitor_index(os.path.join(root, metrics))
+
+# Traza de energía en el tiempo (solo para el escenario NS con ataque)
+TRACE_FILE = 'NS_traza_energia-ATTK.csv'
+
+def run_benchmarks(n_flows, n_bins, n_nodes, n_moves, n_samples=100, repeats=1, workers=1, use_cache=False):
+    """Genera los datos sintéticos, mide cada loader y devuelve el registro de resultados."""
+    if not use_cache:
+        utils.CACHE_DIR = ''
+
+    with tempfile.TemporaryDirectory(prefix='simulador-bench-') as root:
+        generate_results_dir(root, n_flows, n_bins, n_nodes, n_moves)
+        generate_energy_trace_csv(os.path.join(root, TRACE_FILE), n_nodes, n_samples)
+        energy, metrics, anim = SCENARIO_FILES[('NS', True)]
+        registry = utils.discover_scenarios(root)
+        df_trace = utils.load_energy_trace(os.path.join(root, TRACE_FILE))
+        index = utils.build_flowmonitor_index(os.path.join(root, metrics))
+        df_probes = utils.load_flow_probes(os.path.join(root, metrics))
+        df_flows = utils.load_flow_stats(os.path.join(root, metrics))[0]
+        # load_flow_probes deja el índice de bytes: las cargas en frío se miden sin él
+        # y el camino indexado (que se salta FlowProbes) se mide aparte
+        cold, indexed = partial(remove_index_sidecars, root), partial(build_index_sidecars, root)
+        df_anim = utils.parse_netanim_file(os.path.join(root, anim))
+        df_energy = utils.load_energy_data(os.path.join(root, energy))
+        spatial = utils.SpatialIndex(df_anim, df_energy)
+
+        resultados = {
+            'load_energy_data': measure(utils.load_energy_data, os.path.join(root, energy), repeats=repeats),
+            'get_base_metrics': measure(_base_metrics_from_file, os.path.join(root, metrics), repeats=repeats),
+            'load_flow_stats': measure(utils.load_flow_stats, os.path.join(root, metrics), repeats=repeats, setup=cold),
+            'load_flow_stats_indexado': measure(
+                utils.load_flow_stats, os.path.join(root, metrics), repeats=repeats, setup=indexed
+            ),
+            'load_netanim_data': measure(utils.load_netanim_data, os.path.join(root, anim), repeats=repeats),
+            'load_all_data': measure(utils.load_all_data, registry, workers=workers, repeats=repeats, setup=cold),
+            'load_all_data_indexado': measure(
+                utils.load_all_data, registry, workers=workers, repeats=repeats, setup=indexed
+            ),
+            'load_energy_trace': measure(utils.load_energy_trace, os.path.join(root, TRACE_FILE), repeats=repeats),
+            'downsample_traces': measure(utils.downsample_traces, df_trace, repeats=repeats),
+            'build_flowmonitor_index': measure(utils.build_flowmonitor_index, os.path.join(root, metrics), repeats=repeats),
+            'load_flow_probes': measure(utils.load_flow_probes, os.path.join(root, metrics), repeats=repeats, setup=cold),
+            'load_flow_probes_indexado': measure(
+                utils.load_flow_probes, os.path.join(root, metrics), repeats=repeats, setup=indexed
+            ),
+            'probe_delay_contribution': measure(utils.probe_delay_contribution, df_probes, repeats=repeats),
+            'flow_time_series': measure(utils.flow_time_series, df_flows, repeats=repeats),
+            'SpatialIndex': measure(utils.SpatialIndex, df_anim, df_energy, repeats=repeats),
+            'within_radius': measure(spatial.within_radius, 250.0, 250.0, 25.0, spatial.times[-1], repeats=repeats),
+            'read_flow_elements': measure(
+                utils.read_flow_elements, os.path.join(root, metrics), n_flows // 2 + 1, 'FlowStats', index, repeats=repeats
+            ),
+        }
+        tamanos = {name: os.path.getsize(os.path.join(root, name)) for name in (energy, metrics, anim, TRACE_FILE)}
+
+    return {
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'parametros': {
+            'flujos': n_flows, 'bins': n_bins, 'nodos': n_nodes, 'movimientos': n_moves, 'muestras': n_samples,
+            'repeticiones': repeats, 'workers': workers, 'cache': use_cache,
+        },
+        'tamanos_bytes': tamanos,
+        'resultados': resultados,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los loaders de utils con datos sintéticos de ns-3.')
+    parser.add_argument('--flujos', type=int, default=10000, help='Flujos por archivo FlowMonitor.')
+    parser.add_argument('--bins', type=int, default=20, help='Bins por histograma de retardo/jitter.')
+    parser.add_argument('--nodos', type=int, default=1000, help='Nodos en NetAnim y en los reportes de energía.')
+    parser.add_argument('--movimientos', type=int, default=50000, help='Eventos <move> en NetAnim.')
+    parser.add_argument('--muestras', type=int, default=100, help='Muestras por nodo en la traza de energía.')
+    parser.add_argument('--repeticiones', type=int, default=3, help='Repeticiones por medición (se guarda la mejor).')
+    parser.add_argument('--workers', type=int, default=1, help='Procesos para load_all_data.')
+    parser.add_argument('--cache', action='store_true', help='Usar la caché en disco (por defecto desactivada).')
+    parser.add_argument('--salida', default=RESULTS_FILE, help='Archivo JSONL donde se añaden los resultados.')
+    args = parser.parse_args()
+
+    registro = run_benchmarks(
+        args.flujos, args.bins, args.nodos, args.movimientos, args.muestras,
+        repeats=args.repeticiones, workers=args.workers, use_cache=args.cache
+    )
+    with open(args.salida, 'a') as fh:
+        fh.write(json.dumps(registro) + '\n')
+
+    for name, result in registro['resultados'].items():
+        print(f"{name:<26} {result['segundos']:>9.3f} s {result['pico_memoria_MB']:>9.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# instrumentacion.py
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Número de registros que se conservan (los más antiguos se descartan)
+STAGE_BUFFER_SIZE = int(os.environ.get('SIMULADOR_PERF_BUFFER', 1024))
+
+# Medición de memoria con tracemalloc (ralentiza cada asignación, por eso es opcional)
+MEMORY_TRACING = os.environ.get('SIMULADOR_PERF_MEMORIA') == '1'
+
+STAGE_COLUMNS = ['Etapa', 'Inicio', 'Segundos', 'Filas', 'Bytes', 'Bytes_Entrada', 'Memoria_Pico_MB', 'Proceso', 'Error']
+
+_records = deque(maxlen=STAGE_BUFFER_SIZE)
+_lock = threading.Lock()
+# Funciones llamadas con cada registro nuevo (p. ej. para enviarlo a otro sistema)
+_hooks = []
+# Listas que están capturando registros (ver capture_stages)
+_captures = []
+
+if MEMORY_TRACING and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+def register_hook(hook):
+    """Registra una función hook(registro) que se llama al terminar cada etapa."""
+    _hooks.append(hook)
+    return hook
+
+def unregister_hook(hook):
+    """Quita un hook registrado con register_hook."""
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def _frames_in(result):
+    """DataFrames contenidos en el resultado de una etapa (uno, una tupla o ninguno)."""
+    if isinstance(result, pd.DataFrame):
+        return [result]
+    if isinstance(result, (tuple, list)):
+        return [item for item in result if isinstance(item, pd.DataFrame)]
+    return []
+
+def _input_bytes(args):
+    """Tamaño del archivo de entrada si el primer argumento es una ruta existente."""
+    if args and isinstance(args[0], (str, os.PathLike)) and os.path.isfile(args[0]):
+        return os.path.getsize(args[0])
+    return None
+
+def record_stages(records):
+    """Añade registros ya medidos (p. ej. devueltos por un proceso del pool)."""
+    with _lock:
+        for record in records:
+            _records.append(record)
+            for captured in _captures:
+                captured.append(record)
+    for record in records:
+        for hook in list(_hooks):
+            hook(record)
+
+@contextmanager
+def stage(name, args=()):
+    """Mide el bloque como una etapa.
+
+    Entrega un dict en el que el bloque puede dejar el resultado (``'resultado'``)
+    para contar sus filas y bytes.
+    """
+    info = {}
+    memory = tracemalloc.is_tracing()
+    if memory:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    inicio = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield info
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        frames = _frames_in(info.get('resultado'))
+        record_stages([{
+            'Etapa': name,
+            'Inicio': inicio,
+            'Segundos': seconds,
+            'Filas': sum(len(df) for df in frames) if frames else None,
+            'Bytes': int(sum(df.memory_usage(index=False).sum() for df in frames)) if frames else None,
+            'Bytes_Entrada': _input_bytes(args),
+            # Pico aproximado si hay etapas anidadas (cada una reinicia el pico)
+            'Memoria_Pico_MB': (tracemalloc.get_traced_memory()[1] - base) / 1024 / 1024 if memory else None,
+            'Proceso': os.getpid(),
+            'Error': error,
+        }])
+
+def instrumented(name=None):
+    """Decorador que mide cada llamada a la función como una etapa."""
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, args) as info:
+                info['resultado'] = func(*args, **kwargs)
+            return info['resultado']
+        return wrapper
+    return decorator
+
+@contextmanager
+def capture_stages():
+    """Entrega una lista con los registros producidos mientras el bloque está activo."""
+    captured = []
+    with _lock:
+        _captures.append(captured)
+    try:
+        yield captured
+    finally:
+        with _lock:
+            _captures.remove(captured)
+
+def stage_records():
+    """Copia de los registros del buffer, del más antiguo al más reciente."""
+    with _lock:
+        return list(_records)
+
+def clear_stages():
+    """Vacía el buffer de registros."""
+    with _lock:
+        _records.clear()
+
+def stages_frame():
+    """Registros del buffer como DataFrame (columnas STAGE_COLUMNS)."""
+    return pd.DataFrame(stage_records(), columns=STAGE_COLUMNS)
+
+def stages_summary(df_stages=None):
+    """Resumen por etapa: llamadas, tiempo total/medio/máximo, filas y bytes."""
+    df_stages = stages_frame() if df_stages is None else df_stages
+    summary = df_stages.groupby('Etapa').agg(
+        Llamadas=('Segundos', 'size'),
+        Segundos_Total=('Segundos', 'sum'),
+        Segundos_Medio=('Segundos', 'mean'),
+        Segundos_Max=('Segundos', 'max'),
+        Filas=('Filas', 'sum'),
+        Bytes=('Bytes', 'sum'),
+        Bytes_Entrada=('Bytes_Entrada', 'sum'),
+        Memoria_Pico_MB=('Memoria_Pico_MB', 'max'),
+        Errores=('Error', 'count'),
+    )
+    return summary.sort_values('Segundos_Total', ascending=False).reset_index()
+
+def export_json():
+    """Registros del buffer en JSON (una lista de objetos)."""
+    return json.dumps(stage_records(), ensure_ascii=False, indent=2)
+
+def _prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def export_prometheus(prefix='simulador'):
+    """Resumen por etapa en el formato de texto de Prometheus."""
+    summary = stages_summary()
+    metrics = [
+        ('stage_seconds_total', 'counter', 'Tiempo acumulado por etapa (segundos).', 'Segundos_Total'),
+        ('stage_calls_total', 'counter', 'Llamadas registradas por etapa.', 'Llamadas'),
+        ('stage_seconds_max', 'gauge', 'Duración máxima de una llamada (segundos).', 'Segundos_Max'),
+        ('stage_rows_total', 'counter', 'Filas producidas por etapa.', 'Filas'),
+        ('stage_bytes_total', 'counter', 'Bytes de los DataFrames producidos por etapa.', 'Bytes'),
+        ('stage_input_bytes_total', 'counter', 'Bytes de los archivos leídos por etapa.', 'Bytes_Entrada'),
+        ('stage_errors_total', 'counter', 'Llamadas que terminaron con excepción.', 'Errores'),
+    ]
+    lines = []
+    for metric, kind, help_text, column in metrics:
+        name = f'{prefix}_{metric}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for row in summary.itertuples(index=False):
+            value = getattr(row, column)
+            if not pd.isna(value):
+                lines.append(f'{name}{{etapa="{_prometheus_label(row.Etapa)}"}} {float(value):g}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,116 @@
+# reporte.py
+
+import argparse
+import os
+import sys
+
+import pandas as pd
+
+from utils import load_all_data, get_energy_summary, compute_kpis, discover_scenarios, process_pool
+
+# Formatos de salida soportados según la extensión del archivo
+OUTPUT_FORMATS = ('.parquet', '.csv', '.json')
+
+def process_results_dir(results_dir):
+    """Carga un directorio de resultados y calcula sus KPIs y métricas por escenario.
+
+    Se recorren también los subdirectorios (una ejecución por subdirectorio);
+    los KPIs promedian las ejecuciones de cada modo y tipo. Se ejecuta en un
+    proceso aparte por directorio, así que la carga interna de archivos es
+    secuencial (``workers=1``). Un directorio inexistente o sin resultados
+    devuelve ``None`` en lugar de la fila de KPIs, con el motivo como error.
+    """
+    if not os.path.isdir(results_dir):
+        return None, pd.DataFrame(), ['el directorio no existe']
+    registry = discover_scenarios(results_dir)
+    if registry.empty:
+        return None, pd.DataFrame(), ['no se encontraron resultados de ns-3']
+    df_energia, df_metricas, _, _, errores = load_all_data(registry, workers=1)
+    df_energia_summary = get_energy_summary(df_energia)
+
+    kpis = {
+        'Directorio': results_dir,
+        'Ejecuciones': registry['Ejecucion'].nunique(),
+        'Escenarios': df_metricas['Escenario_Completo'].nunique(),
+    }
+    kpis.update(compute_kpis(df_energia_summary, df_metricas))
+    kpis['Errores'] = len(errores)
+
+    df_escenarios = df_metricas.merge(
+        df_energia_summary[['Escenario_Completo', 'Energia_Promedio(J)', 'Energia_Total(J)']],
+        on='Escenario_Completo', how='outer'
+    )
+    df_escenarios.insert(0, 'Directorio', results_dir)
+    return kpis, df_escenarios, errores
+
+def write_frame(df, path):
+    """Escribe ``df`` en Parquet, CSV o JSON según la extensión de ``path``."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.parquet':
+        df.to_parquet(path, index=False)
+    elif ext == '.csv':
+        df.to_csv(path, index=False)
+    elif ext == '.json':
+        df.to_json(path, orient='records', indent=2, force_ascii=False)
+    else:
+        raise ValueError(f"Formato de salida no soportado: '{ext}' (usar {', '.join(OUTPUT_FORMATS)})")
+
+def run_report(results_dirs, workers=None):
+    """Procesa los directorios en paralelo y devuelve (df_kpis, df_escenarios, errores).
+
+    Los directorios inexistentes o sin resultados no tienen fila en ``df_kpis``.
+    """
+    filas, escenarios, errores = [], [], []
+    workers = min(workers or os.cpu_count() or 1, len(results_dirs))
+    if workers <= 1:
+        resultados = map(process_results_dir, results_dirs)
+    else:
+        executor = process_pool(workers)
+        resultados = executor.map(process_results_dir, results_dirs)
+
+    try:
+        for results_dir, (kpis, df_escenarios, errores_dir) in zip(results_dirs, resultados):
+            if kpis is not None:
+                filas.append(kpis)
+                escenarios.append(df_escenarios)
+            errores.extend(f"{results_dir}: {error}" for error in errores_dir)
+    finally:
+        if workers > 1:
+            executor.shutdown()
+
+    df_escenarios = pd.concat(escenarios, ignore_index=True) if escenarios else pd.DataFrame()
+    return pd.DataFrame(filas), df_escenarios, errores
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Genera el reporte de KPIs (S vs NS, Base vs Ataque) sin levantar la app de Streamlit.'
+    )
+    parser.add_argument('directorios', nargs='+', help='Directorios con los resultados de ns-3 (uno por conjunto).')
+    parser.add_argument('--salida', default='reporte_kpis.csv',
+                        help='Archivo de salida (.parquet, .csv o .json). Las métricas por escenario '
+                             'se escriben junto a él con el sufijo "_metricas".')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos en paralelo (por defecto, uno por CPU).')
+    args = parser.parse_args()
+
+    base, ext = os.path.splitext(args.salida)
+    if ext.lower() not in OUTPUT_FORMATS:
+        parser.error(f"formato de salida no soportado: '{ext}'")
+
+    df_kpis, df_escenarios, errores = run_report(args.directorios, args.workers)
+    for error in errores:
+        print(f'⚠️ {error}')
+    if not df_kpis.empty:
+        write_frame(df_kpis, args.salida)
+        write_frame(df_escenarios, f'{base}_metricas{ext}')
+        print(f'{len(df_kpis)} conjuntos de resultados -> {args.salida}')
+
+    # Código de salida distinto de 0 si algún directorio no tenía resultados
+    procesados = set(df_kpis['Directorio']) if not df_kpis.empty else set()
+    sin_resultados = [d for d in args.directorios if d not in procesados]
+    if sin_resultados:
+        print(f"❌ Sin resultados: {', '.join(sin_resultados)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,34 +1,444 @@
 # utils.py
 
+import hashlib
+import io
+import json
+import multiprocessing
+import glob
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import warnings
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
 import xml.etree.ElementTree as ET
+from array import array
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from statistics import NormalDist
+from contextlib import nullcontext
+from instrumentacion import instrumented, stage, capture_stages, record_stages
 
-# Definición de las constantes de archivos
-FILES = {
-    'S_BASE_ENERGIA': 'S_reporte_energia.csv',
-    'NS_BASE_ENERGIA': 'NS_reporte_energia.csv',
-    'S_ATTK_ENERGIA': 'S_reporte_energia_ATTK.csv',
-    'NS_ATTK_ENERGIA': 'NS_reporte_energia_ATTK.csv',
-    'S_BASE_METRICAS': 'S_metricas.xml',
-    'NS_BASE_METRICAS': 'NS_metricas.xml',
-    'S_ATTK_METRICAS': 'S_metricas-ATTK.xml',
-    'NS_ATTK_METRICAS': 'NS_metrica-ATTK.xml',
-    # Archivos de animación (NetAnim)
-    'S_BASE_ANIM': 'S_iot-animacion.xml',
-    'NS_BASE_ANIM': 'NS_iot-animacion.xml',
-    'S_ATTK_ANIM': 'S_iot-animacion-ATTK.xml',
-    'NS_ATTK_ANIM': 'NS_iot-animacion_ATTK.xml',
-}
+# Raíz de resultados donde se descubren los escenarios (archivos sueltos o
+# un directorio por ejecución de un barrido de parámetros)
+RESULTS_ROOT = os.environ.get('SIMULADOR_RESULTS_DIR', '.')
+# Manifiesto opcional por directorio que describe sus escenarios
+MANIFEST_NAME = 'escenarios.json'
+# Nombres de archivo de ns-3: S_reporte_energia_ATTK.csv, NS_metrica-ATTK.xml, ...
+SCENARIO_FILE_RE = re.compile(r'^(?P<modo>S|NS)_(?P<nombre>.+?)(?:[-_](?P<ataque>ATTK))?\.(?:csv|xml)$')
+# Se prueba en orden: 'traza_energia' debe ir antes que 'energia'
+FILE_CLASSES = {'TRAZA': 'traza_energia', 'ENERGIA': 'energia', 'METRICAS': 'metrica', 'ANIM': 'animacion'}
+MODE_LABELS = {'S': 'S_con_Seguridad', 'NS': 'NS_sin_Seguridad'}
+REGISTRY_COLUMNS = ['Escenario_Completo', 'Escenario', 'Tipo', 'Ejecucion', 'Clase', 'Archivo']
 
-def load_energy_data(file_key):
-    """Carga y calcula el consumo de energía promedio de un archivo CSV."""
-    df = pd.read_csv(FILES[file_key])
-    df['Escenario'] = 'S_con_Seguridad' if file_key.startswith('S_') else 'NS_sin_Seguridad'
-    df['Tipo'] = 'Base' if 'BASE' in file_key else 'Ataque'
+# Atributos de cada <Flow> del FlowMonitor
+FLOW_TIME_ATTRS = (
+    'timeFirstTxPacket', 'timeFirstRxPacket', 'timeLastTxPacket', 'timeLastRxPacket',
+    'delaySum', 'jitterSum', 'lastDelay', 'maxDelay', 'minDelay',
+)
+FLOW_COUNT_ATTRS = (
+    'txBytes', 'rxBytes', 'txPackets', 'rxPackets', 'lostPackets', 'timesForwarded',
+)
+HISTOGRAM_TAGS = ('delay', 'jitter')
+# Secciones leídas del FlowMonitor y atributos del clasificador (5-tupla)
+FLOWMONITOR_SECTIONS = ('FlowStats', 'Ipv4FlowClassifier', 'Ipv6FlowClassifier')
+# Secciones del índice de bytes del FlowMonitor (archivo auxiliar junto al XML)
+FLOWMONITOR_INDEX_SECTIONS = ('FlowStats', 'Ipv4FlowClassifier', 'Ipv6FlowClassifier', 'FlowProbes')
+FLOWMONITOR_INDEX_SUFFIX = '.indice.npz'
+FLOWMONITOR_INDEX_VERSION = 1
+CLASSIFIER_ATTRS = ('sourceAddress', 'destinationAddress', 'protocol', 'sourcePort', 'destinationPort')
+CLASSIFIER_INT_ATTRS = ('protocol', 'sourcePort', 'destinationPort')
+# Percentiles de retardo calculados a partir de los histogramas fusionados
+DELAY_QUANTILES = (0.5, 0.95, 0.99)
+# Filas acumuladas antes de convertir en bloque los tiempos en nanosegundos
+PARSE_CHUNK_ROWS = 4096
+HIST_COLUMNS = ['Escenario_Completo', 'Métrica', 'Rango_Inicio (s)', 'Rango_Ancho (s)', 'Conteo']
+# Límite de fotogramas de la animación de nodos
+ANIM_MAX_FRAMES = 200
+# Fotogramas que se conservan antes de submuestrear nodos para cumplir el presupuesto de puntos
+ANIM_MIN_FRAMES = 10
+# Índice espacial: instantes por escenario y nodos esperados por celda de la rejilla
+SPATIAL_MAX_SLICES = ANIM_MAX_FRAMES
+SPATIAL_NODES_PER_CELL = 4
+# Series temporales de carga por intervalo a partir de los tiempos de los flujos
+FLOW_SERIES_BINS = 200
+# Tasa de pérdida (%) a partir de la cual se considera que el ataque ya afecta al escenario
+FLOW_LOSS_THRESHOLD = 1.0
+# Trazas de energía en el tiempo: columnas del CSV, filas por bloque de lectura y puntos por nodo al graficar
+TRACE_COLUMNS = ['Tiempo(s)', 'Nodo_ID', 'Energia_Restante(J)']
+TRACE_CHUNK_ROWS = 1_000_000
+TRACE_MAX_POINTS = 1000
+# Entradas de FlowProbes (formato COO de la matriz dispersa sonda x flujo)
+PROBE_COLUMNS = ['Sonda', 'flowId', 'Paquetes', 'Bytes', 'Retardo_Acumulado_Sum (s)']
+FLUJOS_COLUMNS = (
+    ['Escenario', 'Tipo', 'Escenario_Completo', 'flowId']
+    + list(FLOW_TIME_ATTRS) + list(FLOW_COUNT_ATTRS) + list(CLASSIFIER_ATTRS)
+)
+
+# Esquema tipado común a todos los loaders: claves categóricas, conteos con el
+# entero más pequeño que los contiene y coordenadas en float32
+CATEGORY_COLUMNS = ('Escenario', 'Tipo', 'Escenario_Completo', 'Métrica', 'sourceAddress', 'destinationAddress')
+INTEGER_COLUMNS = (
+    ('Nodo_ID', 'Node_ID', 'flowId', 'Índice', 'Conteo', 'Flujos', 'protocol', 'sourcePort', 'destinationPort',
+     'Paquetes_TX', 'Paquetes_RX', 'Paquetes_Perdidos', 'Sonda', 'Paquetes', 'Bytes') + FLOW_COUNT_ATTRS
+)
+FLOAT32_COLUMNS = ('X', 'Y')
+
+# Caché persistente en disco (Arrow IPC) de los archivos ya parseados.
+# Un directorio vacío en SIMULADOR_CACHE_DIR desactiva la caché.
+CACHE_DIR = os.environ.get('SIMULADOR_CACHE_DIR', '.cache_simulador')
+CACHE_MAX_BYTES = int(float(os.environ.get('SIMULADOR_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+# Incrementar cuando cambie el formato de salida de algún loader
+CACHE_VERSION = 5
+_HASH_MEMO = {}
+
+# Réplicas (semillas): KPIs agregados, nivel de confianza y remuestreos bootstrap
+REPLICATE_METRICS = ['Energia_Promedio(J)', 'Retardo_Promedio (s)', 'Jitter_Promedio (s)', 'Paquetes_Perdidos', 'Bytes_x_Paquete']
+REPLICATE_CONFIDENCE = 0.95
+REPLICATE_BOOTSTRAP = 1000
+
+# Tamaño máximo (JSON) de las figuras memorizadas entre reruns y sesiones
+FIGURE_CACHE_MAX_BYTES = int(float(os.environ.get('SIMULADOR_FIGURAS_MAX_MB', 256)) * 1024 * 1024)
+
+# Escenarios (por tipo de dato) que conserva el almacén compartido entre sesiones
+SHARED_STORE_MAX_SCENARIOS = int(os.environ.get('SIMULADOR_SHARED_MAX_ESCENARIOS', 64))
+
+# Procesos usados para parsear archivos en paralelo (1 = carga secuencial)
+LOAD_WORKERS = int(os.environ.get('SIMULADOR_LOAD_WORKERS', os.cpu_count() or 1))
+# Arranque de los procesos del pool: un fork del servidor de Streamlit (con hilos) puede bloquearse
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+# Lotes de archivos por debajo de este tamaño total se cargan en el proceso: el pool no compensa
+PARALLEL_MIN_BYTES = int(float(os.environ.get('SIMULADOR_PARALELO_MIN_MB', 16)) * 1024 * 1024)
+
+def apply_schema(df, scenarios=None):
+    """Convierte las columnas conocidas de ``df`` al esquema tipado común.
+
+    ``scenarios`` fija las categorías de ``Escenario_Completo`` (p. ej. todos
+    los escenarios del registro) para que los códigos enteros sean los mismos
+    en todos los frames y los filtros puedan compararlos directamente.
+    """
+    for column in df.columns.intersection(CATEGORY_COLUMNS):
+        if column == 'Escenario_Completo' and scenarios is not None:
+            categories = sorted(set(scenarios) | set(df[column].dropna().astype(str)))
+            df[column] = pd.Categorical(df[column].astype(object), categories=categories)
+        elif not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in df.columns.intersection(INTEGER_COLUMNS):
+        values = df[column]
+        # Solo si todos los valores son enteros (sin NaN); el resto se deja igual
+        if values.dtype.kind in 'iu' or (values.dtype.kind == 'f' and values.notna().all()
+                                          and (values == np.floor(values)).all()):
+            df[column] = pd.to_numeric(values, downcast='integer')
+    for column in df.columns.intersection(FLOAT32_COLUMNS):
+        df[column] = df[column].astype(np.float32)
+    return df
+
+def scenario_mask(values, selected):
+    """Máscara de las filas cuyo escenario está en ``selected``.
+
+    Con una columna categórica se comparan los códigos enteros con una tabla de
+    búsqueda (una entrada por categoría) en vez de comparar cadenas fila a fila.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        lookup = np.append(values.cat.categories.isin(list(selected)), False)
+        # El código -1 (valor ausente) apunta a la última entrada (False)
+        return pd.Series(lookup[values.cat.codes.to_numpy()], index=values.index)
+    return values.isin(list(selected))
+
+def file_content_hash(file_path):
+    """Hash BLAKE2 del contenido de un archivo, memorizado por (ruta, tamaño, mtime)."""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _HASH_MEMO:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(block)
+        _HASH_MEMO[memo_key] = digest.hexdigest()
+    return _HASH_MEMO[memo_key]
+
+def _cache_key(loader, file_path, args, kwargs):
+    """Clave de caché: ruta, tamaño, mtime, hash del contenido y llamada al loader."""
+    stat = os.stat(file_path)
+    parts = [
+        str(CACHE_VERSION), loader.__module__, loader.__qualname__,
+        os.path.abspath(file_path), str(stat.st_size), str(stat.st_mtime_ns),
+        file_content_hash(file_path), repr(args), repr(sorted(kwargs.items())),
+    ]
+    return hashlib.blake2b('|'.join(parts).encode(), digest_size=16).hexdigest()
+
+def _read_cache_entry(entry_dir):
+    """Lee una entrada de la caché con memory mapping; None si no existe."""
+    meta_path = os.path.join(entry_dir, 'meta.json')
+    try:
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+        frames = [
+            feather.read_table(os.path.join(entry_dir, f'{i}.arrow'), memory_map=True).to_pandas()
+            for i in range(meta['n_frames'])
+        ]
+        # Marca de uso para la política LRU
+        os.utime(meta_path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return frames[0] if meta['single'] else tuple(frames)
+
+def _write_cache_entry(entry_dir, result, file_path):
+    """Escribe una entrada de forma atómica (directorio temporal + rename)."""
+    single = isinstance(result, pd.DataFrame)
+    frames = [result] if single else list(result)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_DIR, prefix='.tmp-')
+    try:
+        for i, df in enumerate(frames):
+            feather.write_feather(df, os.path.join(tmp_dir, f'{i}.arrow'), compression='uncompressed')
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as fh:
+            json.dump({'source': os.path.abspath(file_path), 'single': single, 'n_frames': len(frames)}, fh)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Otra instancia ya escribió la entrada o el disco no es escribible
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def evict_cache(max_bytes=None):
+    """Elimina las entradas menos usadas recientemente hasta quedar bajo el límite."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not CACHE_DIR or not os.path.isdir(CACHE_DIR):
+        return
+
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        entry_dir = os.path.join(CACHE_DIR, name)
+        meta_path = os.path.join(entry_dir, 'meta.json')
+        if name.startswith('.') or not os.path.isfile(meta_path):
+            continue
+        size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+        entries.append((os.stat(meta_path).st_mtime_ns, size, entry_dir))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+
+def load_cached(loader, file_path, *args, **kwargs):
+    """Ejecuta loader(file_path, ...) reutilizando la caché en disco si es válida.
+
+    El loader debe devolver un DataFrame o una tupla de DataFrames.
+    """
+    if not CACHE_DIR:
+        return loader(file_path, *args, **kwargs)
+
+    entry_dir = os.path.join(CACHE_DIR, _cache_key(loader, file_path, args, kwargs))
+    result = _read_cache_entry(entry_dir)
+    if result is None:
+        result = loader(file_path, *args, **kwargs)
+        _write_cache_entry(entry_dir, result, file_path)
+        evict_cache()
+    return result
+
+def _load_file_task(loader, file_path):
+    """Tarea del pool: carga un archivo y captura el error en vez de propagarlo.
+
+    Devuelve también las etapas medidas durante la carga, porque en un
+    proceso del pool se registran en su propio buffer.
+    """
+    with capture_stages() as stages:
+        try:
+            with stage(f'cargar_archivo:{loader.__qualname__}', (file_path,)) as info:
+                info['resultado'] = load_cached(loader, file_path)
+            return file_path, info['resultado'], None, stages
+        except Exception as e:
+            return file_path, None, f'{file_path}: {type(e).__name__}: {e}', stages
+
+def _init_load_worker(cache_dir):
+    """Inicializa un proceso del pool con la caché del proceso principal (no se hereda sin fork)."""
+    global CACHE_DIR
+    CACHE_DIR = cache_dir
+
+def process_pool(workers, initializer=None, initargs=()):
+    """Pool de procesos arrancado con POOL_START_METHOD en vez de fork."""
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+        initializer=initializer, initargs=initargs
+    )
+
+# Pools de carga reutilizados durante toda la vida del proceso: (procesos, caché) -> pool
+_shared_pools = {}
+_shared_pools_lock = threading.Lock()
+
+def shared_process_pool(workers):
+    """Pool de carga compartido por todo el proceso, creado la primera vez que se pide.
+
+    Arrancar un pool con forkserver/spawn cuesta más que cargar un lote
+    pequeño, así que las cargas sucesivas reutilizan los mismos procesos en
+    lugar de arrancar un pool por llamada.
+    """
+    key = (workers, CACHE_DIR)
+    with _shared_pools_lock:
+        if key not in _shared_pools:
+            _shared_pools[key] = process_pool(workers, _init_load_worker, (CACHE_DIR,))
+        return _shared_pools[key]
+
+def discard_process_pool(pool):
+    """Retira un pool compartido roto (p. ej. un proceso murió) para que el siguiente se cree de nuevo."""
+    with _shared_pools_lock:
+        for key in [key for key, value in _shared_pools.items() if value is pool]:
+            del _shared_pools[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _files_size(paths):
+    """Tamaño total en bytes de los archivos (los que no existen cuentan 0)."""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+@instrumented()
+def load_files(tasks, workers=None):
+    """Carga varios archivos en paralelo con el pool de procesos compartido.
+
+    ``tasks`` es una lista de pares (loader, ruta). Cada proceso devuelve solo
+    los DataFrames columnares ya parseados. Los lotes de un solo archivo o de
+    menos de PARALLEL_MIN_BYTES se cargan en el proceso. Devuelve un dict
+    ruta -> resultado y otro ruta -> mensaje de error de los archivos que no
+    se pudieron cargar.
+    """
+    workers = LOAD_WORKERS if workers is None else workers
+    if len(tasks) < 2 or _files_size(path for _, path in tasks) < PARALLEL_MIN_BYTES:
+        workers = 1
+
+    if workers <= 1:
+        outcomes = [_load_file_task(loader, path) for loader, path in tasks]
+    else:
+        loaders, paths = zip(*tasks)
+        pool = shared_process_pool(workers)
+        try:
+            outcomes = list(pool.map(_load_file_task, loaders, paths))
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
+        # Etapas medidas en los procesos del pool
+        record_stages([record for *_, stages in outcomes for record in stages])
+
+    results = {path: result for path, result, error, _ in outcomes if error is None}
+    errores = {path: error for path, _, error, _ in outcomes if error is not None}
+    # Archivos cargados pero con datos parciales: el aviso va junto a los errores de su ruta
+    for loader, path in tasks:
+        if path in results and loader in LOADER_WARNINGS:
+            aviso = LOADER_WARNINGS[loader](results[path])
+            if aviso:
+                errores[path] = f'{path}: {aviso}'
+    return results, errores
+
+def scenario_name(escenario, tipo, ejecucion=''):
+    """Nombre completo del escenario usado en los filtros de la barra lateral."""
+    nombre = f'{escenario} - {tipo}'
+    return f'{ejecucion}/{nombre}' if ejecucion else nombre
+
+def parse_scenario_filename(file_path):
+    """Extrae (Escenario, Tipo, Clase) del nombre de un archivo; None si no aplica."""
+    match = SCENARIO_FILE_RE.match(os.path.basename(file_path))
+    if match is None:
+        return None
+    nombre = match.group('nombre').lower()
+    clase = next((c for c, clave in FILE_CLASSES.items() if clave in nombre), None)
+    if clase is None:
+        return None
+    tipo = 'Ataque' if match.group('ataque') else 'Base'
+    return MODE_LABELS[match.group('modo')], tipo, clase
+
+def _read_manifest(manifest_path, ejecucion):
+    """Filas del registro descritas por un manifiesto JSON.
+
+    El manifiesto es un objeto o una lista de objetos con ``escenario``, ``tipo``,
+    ``ejecucion`` (opcional) y la ruta relativa de cada clase de archivo
+    (``ENERGIA``, ``TRAZA``, ``METRICAS``, ``ANIM``).
+    """
+    with open(manifest_path) as fh:
+        entries = json.load(fh)
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    base_dir = os.path.dirname(manifest_path)
+    rows = []
+    for entry in entries:
+        escenario, tipo = entry['escenario'], entry['tipo']
+        run = entry.get('ejecucion', ejecucion)
+        for clase in FILE_CLASSES:
+            if entry.get(clase):
+                rows.append((scenario_name(escenario, tipo, run), escenario, tipo, run,
+                             clase, os.path.join(base_dir, entry[clase])))
+    return rows
+
+@instrumented()
+def discover_scenarios(root=None, pattern='**/*'):
+    """Descubre los escenarios disponibles bajo una raíz de resultados.
+
+    Cada directorio se describe con su manifiesto (MANIFEST_NAME) si existe o,
+    si no, a partir de los nombres de archivo de ns-3. Devuelve una tabla con una
+    fila por archivo (REGISTRY_COLUMNS) indexada por escenario y clase; los
+    archivos no se abren hasta que se cargan.
+    """
+    root = RESULTS_ROOT if root is None else root
+    rows = []
+    with_manifest = set()
+    paths = sorted(os.path.normpath(p) for p in glob.glob(os.path.join(root, pattern), recursive=True))
+
+    # 1. Directorios con manifiesto
+    for path in paths:
+        if os.path.basename(path) == MANIFEST_NAME:
+            directory = os.path.dirname(path)
+            with_manifest.add(directory)
+            rows.extend(_read_manifest(path, _run_name(root, directory)))
+
+    # 2. Resto de directorios: metadatos a partir del nombre de archivo
+    for path in paths:
+        directory = os.path.dirname(path)
+        parsed = parse_scenario_filename(path)
+        if parsed is None or directory in with_manifest:
+            continue
+        escenario, tipo, clase = parsed
+        ejecucion = _run_name(root, directory)
+        rows.append((scenario_name(escenario, tipo, ejecucion), escenario, tipo, ejecucion, clase, path))
+
+    registry = pd.DataFrame(rows, columns=REGISTRY_COLUMNS)
+    return registry.set_index(['Escenario_Completo', 'Clase'], drop=False)
+
+def _run_name(root, directory):
+    """Nombre de la ejecución: ruta del directorio relativa a la raíz ('' en la raíz)."""
+    relative = os.path.relpath(directory or os.curdir, root)
+    return '' if relative == '.' else relative.replace(os.sep, '/')
+
+def registry_files(registry, clase, scenarios=None):
+    """Filas del registro de una clase de archivo, opcionalmente solo de ciertos escenarios."""
+    files = registry[registry['Clase'] == clase]
+    if scenarios is not None:
+        files = files[files['Escenario_Completo'].isin(scenarios)]
+    return files
+
+def add_scenario_columns(df, escenario, tipo, escenario_completo=None):
+    """Añade las columnas de escenario a un DataFrame de energía."""
+    df['Escenario'] = escenario
+    df['Tipo'] = tipo
     # Columna combinada para filtros en la barra lateral
-    df['Escenario_Completo'] = df['Escenario'] + ' - ' + df['Tipo']
+    df['Escenario_Completo'] = escenario_completo or scenario_name(escenario, tipo)
     return df
 
+@instrumented()
+def load_energy_data(file_path):
+    """Carga y calcula el consumo de energía promedio de un archivo CSV."""
+    escenario, tipo, _ = parse_scenario_filename(file_path)
+    return add_scenario_columns(load_cached(pd.read_csv, file_path), escenario, tipo)
+
 def convert_ns_to_s(ns_str):
     """Función auxiliar para limpiar y convertir valores de nanosegundos a segundos."""
     try:
@@ -39,6 +449,28 @@ def convert_ns_to_s(ns_str):
     except (ValueError, AttributeError):
         return 0.0
 
+def convert_ns_array_to_s(values):
+    """Convierte en bloque valores ns-3 ('+1.03021e+09ns') a segundos.
+
+    Devuelve un arreglo float64 y el número de valores mal formados, que
+    quedan como NaN en lugar de convertirse silenciosamente en 0.0.
+    """
+    raw = np.char.strip(np.atleast_1d(np.asarray(values, dtype=str)))
+    if raw.size == 0:
+        return np.empty(0, dtype=np.float64), 0
+    head, sep, tail = np.char.rpartition(raw, 'ns').T
+    valid = (sep == 'ns') & (tail == '')
+
+    seconds = np.full(raw.shape, np.nan)
+    try:
+        seconds[valid] = head[valid].astype(np.float64)
+    except ValueError:
+        # Hay números mal formados: to_numeric los convierte en NaN
+        seconds[valid] = pd.to_numeric(pd.Series(head[valid]), errors='coerce').to_numpy(dtype=np.float64)
+    seconds /= 1e9
+
+    return seconds, int(np.isnan(seconds).sum())
+
 def parse_histogram(flow_element, histogram_tag, scenario_completo):
     """Parsea los datos de un histograma (delay o jitter) en un DataFrame."""
     hist_element = flow_element.find(f'{histogram_tag}Histogram')
@@ -54,174 +486,2041 @@ def parse_histogram(flow_element, histogram_tag, scenario_completo):
             })
     return pd.DataFrame(data)
 
+def compute_flow_metrics(retardo_s, jitter_s, tx_bytes, rx_packets, lost_packets):
+    """Calcula los promedios de retardo/jitter y la sobrecarga de un flujo."""
+    # Usaremos RX_Packets para los promedios de Jitter y Retardo (solo aplica a paquetes recibidos)
+    divisor = rx_packets if rx_packets > 0 else 1 
+    
+    return {
+        'Retardo_Sum (s)': retardo_s,
+        'Jitter_Sum (s)': jitter_s,
+        'TX_Bytes': tx_bytes,
+        'RX_Packets': rx_packets,
+        'Lost_Packets': lost_packets,
+        'Retardo_Promedio (s)': retardo_s / divisor,
+        'Jitter_Promedio (s)': jitter_s / divisor,
+        # Cálculo de Sobrecarga
+        'Bytes_x_Paquete': tx_bytes / divisor,
+    }
+
+@instrumented()
 def get_base_metrics(root, scenario_completo):
     """Extrae métricas clave del FlowMonitor (Flow ID 1)."""
     flow = root.find(".//Flow[@flowId='1']")
     
     # Inicializar métricas base
-    base_metrics = {
-        'Retardo_Sum (s)': 0.0, 'Jitter_Sum (s)': 0.0,
-        'TX_Bytes': 0, 'RX_Packets': 0, 'Lost_Packets': 0,
-        'Retardo_Promedio (s)': 0.0, 'Jitter_Promedio (s)': 0.0,
-        'Bytes_x_Paquete': 0.0,
-        'df_delay_hist': pd.DataFrame(), 'df_jitter_hist': pd.DataFrame()
-    }
+    base_metrics = compute_flow_metrics(0.0, 0.0, 0, 0, 0)
+    base_metrics.update({'df_delay_hist': pd.DataFrame(), 'df_jitter_hist': pd.DataFrame()})
 
     if flow is None: return base_metrics
 
-    # 1. Extracción y Conversión
-    retardo_s = convert_ns_to_s(flow.get('delaySum', '0ns'))
-    jitter_s = convert_ns_to_s(flow.get('jitterSum', '0ns'))
-    tx_bytes = int(flow.get('txBytes', 0))
-    rx_packets = int(flow.get('rxPackets', 0))
-    lost_packets = int(flow.get('lostPackets', 0))
-
-    # 2. Cálculos de Promedio
-    # Usaremos RX_Packets para los promedios de Jitter y Retardo (solo aplica a paquetes recibidos)
-    divisor = rx_packets if rx_packets > 0 else 1 
-    
-    retardo_promedio = retardo_s / divisor
-    jitter_promedio = jitter_s / divisor
-    
-    # Cálculo de Sobrecarga
-    bytes_per_packet = tx_bytes / divisor if divisor > 0 else 0
-
-    # 3. Parseo de Histogramas
-    df_delay_hist = parse_histogram(flow, 'delay', scenario_completo)
-    df_jitter_hist = parse_histogram(flow, 'jitter', scenario_completo)
+    # 1. Extracción, Conversión y Cálculos de Promedio
+    base_metrics.update(compute_flow_metrics(
+        convert_ns_to_s(flow.get('delaySum', '0ns')),
+        convert_ns_to_s(flow.get('jitterSum', '0ns')),
+        int(flow.get('txBytes', 0)),
+        int(flow.get('rxPackets', 0)),
+        int(flow.get('lostPackets', 0)),
+    ))
 
-    # 4. Consolidación
+    # 2. Parseo de Histogramas
     base_metrics.update({
-        'Retardo_Sum (s)': retardo_s,
-        'Jitter_Sum (s)': jitter_s,
-        'TX_Bytes': tx_bytes,
-        'RX_Packets': rx_packets,
-        'Lost_Packets': lost_packets,
-        'Retardo_Promedio (s)': retardo_promedio,
-        'Jitter_Promedio (s)': jitter_promedio,
-        'Bytes_x_Paquete': bytes_per_packet,
-        'df_delay_hist': df_delay_hist,
-        'df_jitter_hist': df_jitter_hist
+        'df_delay_hist': parse_histogram(flow, 'delay', scenario_completo),
+        'df_jitter_hist': parse_histogram(flow, 'jitter', scenario_completo)
     })
     
     return base_metrics
 
+def iter_section_elements(file_path, sections=('FlowStats',), index=None):
+    """Recorre en streaming los hijos directos de las secciones indicadas del FlowMonitor.
+
+    Entrega pares (sección, elemento) con cada elemento ya completo y lo libera
+    en cuanto el consumidor termina con él, de modo que la memoria no crece con
+    el tamaño del archivo. Con un índice de bytes (flowmonitor_index) solo se
+    leen los rangos de las secciones pedidas; el resto del archivo no se toca.
+    """
+    if index is not None:
+        yield from _iter_indexed_sections(file_path, sections, index)
+        return
+
+    root = None
+    section_elem = None
+    depth = 0
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 2:
+                section_elem = elem
+            continue
+
+        # Evento 'end': 'depth' es la profundidad del elemento que se cierra
+        if depth == 3:
+            if section_elem.tag in sections:
+                yield section_elem.tag, elem
+            section_elem.clear()
+        elif depth == 2:
+            root.clear()
+        depth -= 1
+
+# Etiquetas que delimitan secciones y flujos en el índice de bytes
+_INDEX_TAG_RE = re.compile(
+    rb'<(/?)(FlowStats|Ipv4FlowClassifier|Ipv6FlowClassifier|FlowProbes|FlowProbe|Flow)\b([^>]*?)(/?)>'
+)
+_FLOW_ID_RE = re.compile(rb'flowId="(\d+)"')
+_PROBE_INDEX_RE = re.compile(rb'index="(\d+)"')
+
+# Índice de bytes de un FlowMonitor. Las entradas (un <Flow> por sección y un
+# <FlowStats> por sonda y flujo en FlowProbes) están ordenadas por sección,
+# flowId y sonda; las de la sección i son entry_offsets[i]:entry_offsets[i + 1].
+FlowMonitorIndex = namedtuple(
+    'FlowMonitorIndex', ['section_start', 'section_end', 'entry_offsets', 'flow_id', 'probe', 'start', 'end']
+)
+
+class _MappedRange(io.RawIOBase):
+    """Archivo de solo lectura sobre un rango [start, end) de un mmap."""
+
+    def __init__(self, mm, start, end):
+        self.mm, self.pos, self.end = mm, start, end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), self.end - self.pos))
+        buffer[:n] = self.mm[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+@instrumented()
+def build_flowmonitor_index(file_path):
+    """Recorre el FlowMonitor una vez y registra el rango de bytes de cada sección y flujo.
+
+    Solo busca las etiquetas de sección, <Flow>, <FlowProbe> y <FlowStats>
+    (una expresión regular sobre el archivo mapeado en memoria), sin construir
+    elementos. Las secciones que no se cierran (archivo a medio escribir)
+    quedan con rango -1.
+    """
+    n_sections = len(FLOWMONITOR_INDEX_SECTIONS)
+    section_start = np.full(n_sections, -1, dtype=np.int64)
+    section_end = np.full(n_sections, -1, dtype=np.int64)
+    entries = {name: array('q') for name in ('section', 'flow_id', 'probe', 'start', 'end')}
+    section, probe, item = None, -1, None
+
+    def add_entry(flow_id, start, end):
+        for name, value in zip(entries, (section, flow_id, probe, start, end)):
+            entries[name].append(value)
+
+    with open(file_path, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        # Un archivo vacío no se puede mapear
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else nullcontext(b'') as mm:
+            for match in _INDEX_TAG_RE.finditer(mm):
+                closing, tag, attrs, self_closing = match.groups()
+                tag = tag.decode()
+                # 1. Apertura y cierre de las secciones de primer nivel
+                if section is None:
+                    if not closing and tag in FLOWMONITOR_INDEX_SECTIONS:
+                        section, start = FLOWMONITOR_INDEX_SECTIONS.index(tag), match.start()
+                        if self_closing:
+                            section_start[section], section_end[section] = start, match.end()
+                            section = None
+                    continue
+                if closing and tag == FLOWMONITOR_INDEX_SECTIONS[section]:
+                    section_start[section], section_end[section] = start, match.end()
+                    section, probe = None, -1
+                    continue
+
+                # 2. Flujos: <Flow> en FlowStats y clasificadores, <FlowStats> dentro de cada <FlowProbe>
+                in_probes = FLOWMONITOR_INDEX_SECTIONS[section] == 'FlowProbes'
+                if in_probes and tag == 'FlowProbe':
+                    if not closing:
+                        probe = int(_PROBE_INDEX_RE.search(attrs).group(1))
+                    continue
+                if tag != ('FlowStats' if in_probes else 'Flow'):
+                    continue
+                if closing:
+                    if item is not None:
+                        add_entry(item[0], item[1], match.end())
+                        item = None
+                else:
+                    flow_id = int(_FLOW_ID_RE.search(attrs).group(1))
+                    if self_closing:
+                        add_entry(flow_id, match.start(), match.end())
+                    else:
+                        item = (flow_id, match.start())
+
+    columns = {name: np.frombuffer(values, dtype=np.int64) for name, values in entries.items()}
+    order = np.lexsort((columns['probe'], columns['flow_id'], columns['section']))
+    entry_offsets = np.searchsorted(columns['section'][order], np.arange(n_sections + 1))
+    return FlowMonitorIndex(
+        section_start, section_end, entry_offsets,
+        *(columns[name][order] for name in ('flow_id', 'probe', 'start', 'end'))
+    )
+
+def flowmonitor_index(file_path, build=True):
+    """Índice de bytes del FlowMonitor, leído del archivo auxiliar si sigue siendo válido.
+
+    El archivo auxiliar (``<xml>`` + FLOWMONITOR_INDEX_SUFFIX) guarda el tamaño y
+    el mtime del XML; si no coinciden el índice se reconstruye. Con
+    ``build=False`` devuelve None en vez de recorrer el archivo. Si el
+    directorio no es escribible el índice se devuelve sin guardarlo.
+    """
+    stat = os.stat(file_path)
+    stamp = np.array([FLOWMONITOR_INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    sidecar = file_path + FLOWMONITOR_INDEX_SUFFIX
+    try:
+        with np.load(sidecar) as stored:
+            if np.array_equal(stored['stamp'], stamp):
+                return FlowMonitorIndex(*(stored[name] for name in FlowMonitorIndex._fields))
+    except (OSError, ValueError, KeyError):
+        pass
+    if not build:
+        return None
+
+    index = build_flowmonitor_index(file_path)
+    tmp_path = f'{sidecar}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fh:
+            np.savez(fh, stamp=stamp, **index._asdict())
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        # Directorio de resultados de solo lectura: el índice se usa sin guardarlo
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return index
+
+def _iter_indexed_sections(file_path, sections, index):
+    """Como iter_section_elements, pero parseando solo los rangos de bytes de las secciones."""
+    ranges = sorted(
+        (index.section_start[i], index.section_end[i], name)
+        for i, name in enumerate(FLOWMONITOR_INDEX_SECTIONS)
+        if name in sections and index.section_start[i] >= 0
+    )
+    if not ranges:
+        return
+    with open(file_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start, end, name in ranges:
+            section_root = None
+            depth = 0
+            # Cada sección es un documento XML válido por sí sola
+            for event, elem in ET.iterparse(_MappedRange(mm, start, end), events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 1:
+                        section_root = elem
+                    continue
+                if depth == 2:
+                    yield name, elem
+                    section_root.clear()
+                depth -= 1
+
+def read_flow_elements(file_path, flow_id, section='FlowStats', index=None):
+    """Elementos de un flujo en una sección, leídos directamente por su rango de bytes.
+
+    Devuelve una lista (vacía si el flujo no está): un <Flow> en FlowStats y
+    en los clasificadores y un <FlowStats> por sonda en FlowProbes, con el
+    índice de la sonda en el atributo ``probe``. La búsqueda
+    es binaria sobre el índice, así que el coste no depende del tamaño del archivo.
+    """
+    index = flowmonitor_index(file_path) if index is None else index
+    i = FLOWMONITOR_INDEX_SECTIONS.index(section)
+    lo, hi = index.entry_offsets[i], index.entry_offsets[i + 1]
+    first = lo + np.searchsorted(index.flow_id[lo:hi], flow_id, side='left')
+    last = lo + np.searchsorted(index.flow_id[lo:hi], flow_id, side='right')
+    if first == last:
+        return []
+    elements = []
+    with open(file_path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for j in range(first, last):
+            elem = ET.fromstring(mm[index.start[j]:index.end[j]])
+            if index.probe[j] >= 0:
+                elem.set('probe', str(index.probe[j]))
+            elements.append(elem)
+    return elements
+
+@instrumented()
+def load_flow_stats(file_path, histogram_tags=HISTOGRAM_TAGS):
+    """Carga en streaming todos los <Flow> de un FlowMonitor en formato columnar.
+
+    Devuelve tres DataFrames: uno con una fila por flujo (atributos de tiempo en
+    segundos), otro con el histograma de cada métrica indicada sumado sobre
+    todos los flujos del archivo (un bin por fila, en la rejilla de
+    bins_to_histogram) y la tabla del clasificador (5-tupla de cada flowId).
+    Los bins se acumulan durante el parseo, así que la memoria es O(bins) y no
+    O(flujos x bins). El número de tiempos mal formados (NaN) queda en
+    ``df_flows.attrs['tiempos_invalidos']``.
+    """
+    flow_ids = array('l')
+    pending_times = {attr: [] for attr in FLOW_TIME_ATTRS}
+    times = {attr: [] for attr in FLOW_TIME_ATTRS}
+    n_bad = 0
+    counts = {attr: array('q') for attr in FLOW_COUNT_ATTRS}
+    # (métrica, inicio, ancho) -> conteo sumado sobre los flujos
+    bin_counts = {tag: {} for tag in histogram_tags}
+    classifier = {'flowId': array('l'), **{attr: [] for attr in CLASSIFIER_ATTRS}}
+
+    def flush_times():
+        nonlocal n_bad
+        for attr, pending in pending_times.items():
+            seconds, bad = convert_ns_array_to_s(pending)
+            times[attr].append(seconds)
+            n_bad += bad
+            pending.clear()
+
+    # Si ya existe el índice de bytes se salta la sección FlowProbes sin parsearla
+    index = flowmonitor_index(file_path, build=False)
+    for section, flow in iter_section_elements(file_path, FLOWMONITOR_SECTIONS, index):
+        if section != 'FlowStats':
+            # 5-tupla del clasificador (Ipv4/Ipv6)
+            classifier['flowId'].append(int(flow.get('flowId')))
+            for attr in CLASSIFIER_ATTRS:
+                value = flow.get(attr)
+                classifier[attr].append(int(value) if attr in CLASSIFIER_INT_ATTRS else value)
+            continue
+
+        flow_id = int(flow.get('flowId'))
+        flow_ids.append(flow_id)
+        for attr, pending in pending_times.items():
+            pending.append(flow.get(attr, '0ns'))
+        for attr, values in counts.items():
+            values.append(int(flow.get(attr, 0)))
+
+        for tag, counts_by_bin in bin_counts.items():
+            hist_element = flow.find(f'{tag}Histogram')
+            if hist_element is None:
+                continue
+            for bin_elem in hist_element.iter('bin'):
+                key = (bin_elem.get('start'), bin_elem.get('width'))
+                counts_by_bin[key] = counts_by_bin.get(key, 0) + int(bin_elem.get('count'))
+
+        if len(pending_times[FLOW_TIME_ATTRS[0]]) >= PARSE_CHUNK_ROWS:
+            flush_times()
+
+    flush_times()
+    df_flows = pd.DataFrame({
+        'flowId': flow_ids,
+        **{attr: np.concatenate(chunks) for attr, chunks in times.items()},
+        **counts
+    })
+    apply_schema(df_flows)
+    df_flows.attrs['tiempos_invalidos'] = n_bad
+
+    hist_frames = []
+    for tag, counts_by_bin in bin_counts.items():
+        if counts_by_bin:
+            starts, widths = zip(*counts_by_bin)
+            frame = histogram_to_frame(bins_to_histogram(
+                np.array(starts, dtype=np.float64), np.array(widths, dtype=np.float64), list(counts_by_bin.values())
+            ))
+            frame.insert(0, 'Métrica', tag.capitalize())
+            hist_frames.append(frame)
+    df_hist = pd.concat(hist_frames, ignore_index=True) if hist_frames else pd.DataFrame(columns=HIST_COLUMNS[1:])
+    return df_flows, apply_schema(df_hist), apply_schema(pd.DataFrame(classifier))
+
+@instrumented()
+def load_flow_probes(file_path):
+    """Carga la sección FlowProbes como matriz dispersa sonda x flujo en formato COO.
+
+    Devuelve una fila por par (sonda, flujo) presente en el archivo
+    (PROBE_COLUMNS), sin reservar la matriz densa. Solo se parsea el rango de
+    bytes de FlowProbes (ver flowmonitor_index). ``Retardo_Acumulado_Sum (s)``
+    es el retardo acumulado desde la primera sonda del flujo, sumado sobre sus
+    paquetes (``delayFromFirstProbeSum``).
+    """
+    columns = {'Sonda': array('l'), 'flowId': array('l'), 'Paquetes': array('q'), 'Bytes': array('q')}
+    delays, pending = [], []
+
+    for _, probe in iter_section_elements(file_path, ('FlowProbes',), flowmonitor_index(file_path)):
+        sonda = int(probe.get('index'))
+        for stats in probe.iterfind('FlowStats'):
+            columns['Sonda'].append(sonda)
+            columns['flowId'].append(int(stats.get('flowId')))
+            columns['Paquetes'].append(int(stats.get('packets', 0)))
+            columns['Bytes'].append(int(stats.get('bytes', 0)))
+            pending.append(stats.get('delayFromFirstProbeSum', '0ns'))
+        if len(pending) >= PARSE_CHUNK_ROWS:
+            delays.append(convert_ns_array_to_s(pending)[0])
+            pending.clear()
+
+    delays.append(convert_ns_array_to_s(pending)[0])
+    df = pd.DataFrame({**columns, 'Retardo_Acumulado_Sum (s)': np.concatenate(delays)})
+    return apply_schema(df)
+
+# Matriz dispersa sonda x flujo en formato COO: entradas ordenadas por (fila, columna) y sin duplicados
+ProbeFlowMatrix = namedtuple('ProbeFlowMatrix', ['shape', 'row', 'col', 'data'])
+
+def probe_flow_matrix(df_probes, column='Paquetes'):
+    """Matriz dispersa sonda x flujo (COO, solo numpy) con una columna de load_flow_probes.
+
+    Las entradas repetidas de un mismo par (sonda, flujo) se suman. Donde haya
+    SciPy se convierte con ``coo_array((m.data, (m.row, m.col)), shape=m.shape)``.
+    """
+    rows = df_probes['Sonda'].to_numpy(dtype=np.int64)
+    cols = df_probes['flowId'].to_numpy(dtype=np.int64)
+    shape = (int(rows.max()) + 1, int(cols.max()) + 1) if len(df_probes) else (0, 0)
+    keys, inverse = np.unique(rows * shape[1] + cols, return_inverse=True)
+    data = np.bincount(inverse, weights=df_probes[column].to_numpy(dtype=np.float64), minlength=len(keys))
+    if df_probes[column].dtype.kind in 'iu':
+        data = data.astype(np.int64)
+    return ProbeFlowMatrix(shape, keys // max(shape[1], 1), keys % max(shape[1], 1), data)
+
+def hop_delays(df_probes):
+    """Retardo que añade cada sonda (salto) al camino de cada flujo.
+
+    Por flujo, las sondas se ordenan por su retardo medio acumulado desde la
+    primera sonda (suma / paquetes); el retardo del salto es la diferencia con
+    la sonda anterior (0 en la primera). Se calcula sobre las entradas COO,
+    así que el coste es lineal en el número de pares (sonda, flujo).
+    """
+    packets = df_probes['Paquetes'].to_numpy(dtype=np.float64)
+    cumulative = df_probes['Retardo_Acumulado_Sum (s)'].to_numpy() / np.where(packets > 0, packets, np.nan)
+    flow_ids = df_probes['flowId'].to_numpy()
+    order = np.lexsort((cumulative, flow_ids))
+
+    cumulative, flow_ids = cumulative[order], flow_ids[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = flow_ids[1:] != flow_ids[:-1]
+    hop = np.diff(cumulative, prepend=np.nan)
+    hop[first] = 0.0
+
+    return pd.DataFrame({
+        'Sonda': df_probes['Sonda'].to_numpy()[order],
+        'flowId': flow_ids,
+        'Paquetes': df_probes['Paquetes'].to_numpy()[order],
+        'Retardo_Acumulado (s)': cumulative,
+        'Retardo_Salto (s)': hop,
+    })
+
+@instrumented()
+def probe_delay_contribution(df_probes):
+    """Contribución de cada sonda (nodo) al retardo de extremo a extremo, de mayor a menor.
+
+    ``Retardo_Salto_Total (s)`` suma el retardo del salto por los paquetes que
+    pasan por la sonda; ``Retardo_Salto_Medio (s)`` es ese total por paquete.
+    """
+    hops = hop_delays(df_probes)
+    if hops.empty:
+        return pd.DataFrame(columns=['Sonda', 'Flujos', 'Paquetes', 'Retardo_Salto_Total (s)',
+                                     'Retardo_Salto_Medio (s)', 'Contribución (%)'])
+    sondas = hops['Sonda'].to_numpy()
+    packets = hops['Paquetes'].to_numpy(dtype=np.float64)
+    weighted = np.nan_to_num(hops['Retardo_Salto (s)'].to_numpy()) * packets
+    n = int(sondas.max()) + 1
+
+    total = np.bincount(sondas, weights=weighted, minlength=n)
+    paquetes = np.bincount(sondas, weights=packets, minlength=n)
+    flujos = np.bincount(sondas, minlength=n)
+    present = np.flatnonzero(flujos)
+    summary = pd.DataFrame({
+        'Sonda': present,
+        'Flujos': flujos[present],
+        'Paquetes': paquetes[present].astype(np.int64),
+        'Retardo_Salto_Total (s)': total[present],
+        'Retardo_Salto_Medio (s)': total[present] / np.where(paquetes[present] > 0, paquetes[present], 1),
+        'Contribución (%)': total[present] / total.sum() * 100 if total.sum() > 0 else 0.0,
+    })
+    return summary.sort_values('Retardo_Salto_Total (s)', ascending=False, ignore_index=True)
+
+# Histograma disperso sobre una rejilla uniforme: bin i cubre [i*width, (i+1)*width)
+SparseHistogram = namedtuple('SparseHistogram', ['width', 'index', 'count'])
+
+def sparse_histogram(index, count, width):
+    """Construye un SparseHistogram sumando los conteos de índices repetidos."""
+    unique, inverse = np.unique(np.asarray(index, dtype=np.int64), return_inverse=True)
+    summed = np.bincount(inverse, weights=np.asarray(count, dtype=np.float64), minlength=len(unique))
+    return SparseHistogram(float(width), unique, summed.astype(np.int64))
+
+def bins_to_histogram(starts, widths, counts):
+    """Lleva bins de FlowMonitor (inicio, ancho, conteo) a la rejilla de su ancho mayor."""
+    widths = np.asarray(widths, dtype=np.float64)
+    if widths.size == 0:
+        return sparse_histogram([], [], 0.0)
+    width = widths.max()
+    index = np.floor(np.asarray(starts, dtype=np.float64) / width + 1e-9)
+    return sparse_histogram(index, counts, width)
+
+def rebin_histogram(hist, width):
+    """Re-binea a una rejilla más gruesa de ancho ``width``."""
+    index = np.floor(hist.index * hist.width / width + 1e-9)
+    return sparse_histogram(index, hist.count, width)
+
+def merge_histograms(hists):
+    """Suma histogramas (de varios flujos o escenarios) sobre la rejilla más gruesa."""
+    hists = [h for h in hists if h.index.size]
+    if not hists:
+        return sparse_histogram([], [], 0.0)
+    width = max(h.width for h in hists)
+    hists = [h if h.width == width else rebin_histogram(h, width) for h in hists]
+    return sparse_histogram(
+        np.concatenate([h.index for h in hists]), np.concatenate([h.count for h in hists]), width
+    )
+
+def log_rebin_histogram(hist, bins_per_decade=10):
+    """Re-binea a escala logarítmica; devuelve (inicios, anchos, conteos).
+
+    Cada bin original se asigna por su punto medio; los valores por debajo del
+    ancho original caen en un primer intervalo lineal [0, width).
+    """
+    if hist.index.size == 0:
+        return np.empty(0), np.empty(0), np.empty(0, dtype=np.int64)
+    mids = (hist.index + 0.5) * hist.width
+    lo = np.floor(np.log10(hist.width) * bins_per_decade)
+    hi = np.ceil(np.log10((hist.index.max() + 1) * hist.width) * bins_per_decade)
+    edges = np.concatenate([[0.0], 10 ** (np.arange(lo, hi + 1) / bins_per_decade)])
+    slot = np.clip(np.searchsorted(edges, mids, side='right') - 1, 0, len(edges) - 2)
+    counts = np.bincount(slot, weights=hist.count, minlength=len(edges) - 1).astype(np.int64)
+    used = counts > 0
+    return edges[:-1][used], np.diff(edges)[used], counts[used]
+
+def histogram_cdf(hist):
+    """CDF en el extremo superior de cada bin: (valores, fracción acumulada)."""
+    cum = np.cumsum(hist.count)
+    total = cum[-1] if cum.size else 0
+    return (hist.index + 1) * hist.width, cum / total if total else cum.astype(np.float64)
+
+def histogram_quantile(hist, quantiles):
+    """Cuantiles de un SparseHistogram, interpolando dentro del bin.
+
+    Para cada cuantil se toma el primer bin cuyo conteo acumulado alcanza la
+    fracción pedida y se interpola linealmente dentro de él.
+    """
+    counts = hist.count.astype(np.float64)
+    cum = np.cumsum(counts)
+    total = cum[-1] if cum.size else 0.0
+    result = {}
+    for q in quantiles:
+        target = q * total
+        first = np.searchsorted(cum, target, side='left')
+        if total <= 0 or first >= len(cum):
+            result[q] = np.nan
+            continue
+        frac = (target - (cum[first] - counts[first])) / counts[first]
+        result[q] = (hist.index[first] + frac) * hist.width
+    return result
+
+def histogram_to_frame(hist):
+    """Convierte un SparseHistogram en columnas (Rango_Inicio, Rango_Ancho, Conteo)."""
+    return pd.DataFrame({
+        'Rango_Inicio (s)': hist.index * hist.width,
+        'Rango_Ancho (s)': np.full(len(hist.index), hist.width),
+        'Conteo': hist.count,
+    })
+
+@instrumented()
+def rescale_histograms(df_hist, factor=1, bins_per_decade=None):
+    """Re-binea los histogramas de cada escenario y métrica (x ``factor`` o logarítmico)."""
+    frames = []
+    for (escenario, metrica), group in df_hist.groupby(['Escenario_Completo', 'Métrica'], observed=True, sort=True):
+        hist = bins_to_histogram(group['Rango_Inicio (s)'], group['Rango_Ancho (s)'], group['Conteo'])
+        if bins_per_decade:
+            starts, widths, counts = log_rebin_histogram(hist, bins_per_decade)
+            frame = pd.DataFrame({'Rango_Inicio (s)': starts, 'Rango_Ancho (s)': widths, 'Conteo': counts})
+        else:
+            frame = histogram_to_frame(rebin_histogram(hist, hist.width * factor) if factor > 1 else hist)
+        frame.insert(0, 'Métrica', metrica)
+        frame.insert(0, 'Escenario_Completo', escenario)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=HIST_COLUMNS)
+
+@instrumented()
+def histograms_cdf(df_hist):
+    """CDF de los histogramas de cada escenario y métrica, para graficar como líneas."""
+    frames = []
+    for (escenario, metrica), group in df_hist.groupby(['Escenario_Completo', 'Métrica'], observed=True, sort=True):
+        values, fraction = histogram_cdf(
+            bins_to_histogram(group['Rango_Inicio (s)'], group['Rango_Ancho (s)'], group['Conteo'])
+        )
+        frames.append(pd.DataFrame({
+            'Escenario_Completo': escenario, 'Métrica': metrica,
+            'Valor (s)': values, 'Fracción_Acumulada': fraction,
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=['Escenario_Completo', 'Métrica', 'Valor (s)', 'Fracción_Acumulada']
+    )
+
+# Totales por grupo de flujos: nombre -> (columna de la tabla por flujo, agregación)
+FLOW_TOTALS = {
+    'Flujos': ('flowId', 'size'),
+    'TX_Packets': ('txPackets', 'sum'),
+    'RX_Packets': ('rxPackets', 'sum'),
+    'Lost_Packets': ('lostPackets', 'sum'),
+    'TX_Bytes': ('txBytes', 'sum'),
+    'RX_Bytes': ('rxBytes', 'sum'),
+    'Retardo': ('delaySum', 'sum'),
+    'Jitter': ('jitterSum', 'sum'),
+    'Inicio': ('timeFirstTxPacket', 'min'),
+    'Fin': ('timeLastRxPacket', 'max'),
+}
+
+def totals_summary(agg):
+    """Métricas derivadas de los totales por grupo (columnas de FLOW_TOTALS)."""
+    # Mismas fórmulas que compute_flow_metrics, sobre los totales del grupo
+    divisor = agg['RX_Packets'].where(agg['RX_Packets'] > 0, 1)
+    tx_packets = agg['TX_Packets'].where(agg['TX_Packets'] > 0, 1)
+    duracion = (agg['Fin'] - agg['Inicio']).where(lambda d: d > 0)
+    summary = pd.DataFrame({
+        'Flujos': agg['Flujos'],
+        'Retardo_Sum (s)': agg['Retardo'],
+        'Jitter_Sum (s)': agg['Jitter'],
+        'Retardo_Promedio (s)': agg['Retardo'] / divisor,
+        'Jitter_Promedio (s)': agg['Jitter'] / divisor,
+        'Bytes_x_Paquete': agg['TX_Bytes'] / divisor,
+        'Paquetes_TX': agg['TX_Packets'],
+        'Paquetes_RX': agg['RX_Packets'],
+        'Paquetes_Perdidos': agg['Lost_Packets'],
+        'PDR (%)': agg['RX_Packets'] / tx_packets * 100,
+        'Throughput (bps)': (agg['RX_Bytes'] * 8 / duracion).fillna(0.0),
+    })
+    return summary
+
+@instrumented()
+def aggregate_flows(df_flows, by='Escenario_Completo'):
+    """Agrega las métricas de todos los flujos por escenario o por campos de la 5-tupla.
+
+    ``df_flows`` es la tabla por flujo (con las columnas de ``by``). Los
+    percentiles de retardo solo existen por escenario: los histogramas se
+    suman sobre los flujos al cargar (ver _add_delay_percentiles).
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    grouped = df_flows.groupby(by, observed=True, sort=True)
+    return totals_summary(grouped.agg(**FLOW_TOTALS)).reset_index()
+
+def flow_time_warning(result):
+    """Aviso si algún flujo de un resultado de load_flow_stats tiene tiempos ns-3 mal formados.
+
+    Se cuenta sobre los propios datos (tiempos NaN), así que no depende de
+    ``attrs``, que se pierde al concatenar o copiar los frames.
+    """
+    df_flows = result[0]
+    n_bad = int(df_flows[list(FLOW_TIME_ATTRS)].isna().any(axis=1).sum())
+    if not n_bad:
+        return None
+    return f'{n_bad} flujo(s) con tiempos ns-3 mal formados (NaN), excluidos de duraciones y throughput'
+
+# Avisos de datos parciales por loader (se añaden a los errores por archivo de load_files)
+LOADER_WARNINGS = {load_flow_stats: flow_time_warning}
+
+def _cumulative_amount(starts, ends, amounts, edges):
+    """Cantidad acumulada hasta cada borde, repartiendo cada ``amount`` uniformemente en [start, end].
+
+    ``amounts`` tiene forma (flujos, k): las k cantidades comparten el mismo
+    orden de eventos, así que solo se ordena una vez. Devuelve (bordes, k).
+
+    Barrido sobre los eventos ordenados: la suma acumulada de las pendientes
+    (+tasa al empezar, -tasa al terminar) da la tasa total entre eventos y su
+    integral en cada evento; cada borde se evalúa con una búsqueda binaria.
+    Los intervalos de duración 0 se tratan como masas puntuales. O(n log n).
+    """
+    cumulative = np.zeros((len(edges), amounts.shape[1]))
+    spread = ends > starts
+
+    # 1. Intervalos con duración: tasa constante amount / duración
+    if spread.any():
+        rates = amounts[spread] / (ends[spread] - starts[spread])[:, None]
+        times = np.concatenate([starts[spread], ends[spread]])
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        rate_after = np.cumsum(np.concatenate([rates, -rates])[order], axis=0)
+        # Después del último evento no queda ningún intervalo abierto (evita arrastrar error numérico)
+        rate_after[-1] = 0.0
+        integral = np.vstack([np.zeros((1, amounts.shape[1])),
+                              np.cumsum(rate_after[:-1] * np.diff(times)[:, None], axis=0)])
+        k = np.searchsorted(times, edges, side='right') - 1
+        inside = k >= 0
+        kk = k[inside]
+        cumulative[inside] = integral[kk] + rate_after[kk] * (edges[inside] - times[kk])[:, None]
+
+    # 2. Masas puntuales (primer y último paquete en el mismo instante)
+    if (~spread).any():
+        order = np.argsort(starts[~spread], kind='stable')
+        points = starts[~spread][order]
+        mass = np.vstack([np.zeros((1, amounts.shape[1])), np.cumsum(amounts[~spread][order], axis=0)])
+        cumulative += mass[np.searchsorted(points, edges, side='right')]
+    return cumulative
+
+def flow_time_edges(dfs, n_bins=FLOW_SERIES_BINS):
+    """Bordes comunes de los intervalos para comparar varios frames de flujos en el mismo eje."""
+    starts = [df['timeFirstTxPacket'].min() for df in dfs if not df.empty]
+    ends = [max(df['timeLastTxPacket'].max(), df['timeLastRxPacket'].max()) for df in dfs if not df.empty]
+    if not starts:
+        return np.linspace(0.0, 1.0, n_bins + 1)
+    t_start, t_end = np.nanmin(starts), np.nanmax(ends)
+    return np.linspace(t_start, t_end if t_end > t_start else t_start + 1.0, n_bins + 1)
+
+@instrumented()
+def flow_time_series(df_flows, edges=None, n_bins=FLOW_SERIES_BINS):
+    """Carga ofrecida, carga entregada y tasa de pérdida por intervalo de tiempo.
+
+    Cada flujo reparte sus paquetes y bytes transmitidos (y sus pérdidas)
+    uniformemente entre ``timeFirstTxPacket`` y ``timeLastTxPacket``, y los
+    recibidos entre ``timeFirstRxPacket`` y ``timeLastRxPacket``. Las series
+    salen de sumas acumuladas sobre los eventos ordenados (_cumulative_amount),
+    así que el coste es O(n log n) en el número de flujos. Los flujos con
+    tiempos inválidos (NaN) se omiten.
+    """
+    edges = flow_time_edges([df_flows], n_bins) if edges is None else np.asarray(edges, dtype=np.float64)
+    columns = {
+        column: df_flows[column].to_numpy(np.float64)
+        for column in ('timeFirstTxPacket', 'timeLastTxPacket', 'timeFirstRxPacket', 'timeLastRxPacket',
+                       'txPackets', 'rxPackets', 'lostPackets', 'txBytes', 'rxBytes')
+    }
+    valid = np.isfinite(columns['timeFirstTxPacket']) & np.isfinite(columns['timeLastTxPacket'])
+    valid_rx = valid & np.isfinite(columns['timeFirstRxPacket']) & np.isfinite(columns['timeLastRxPacket'])
+
+    def per_bin(first, last, amounts, mask):
+        stacked = np.column_stack([columns[amount][mask] for amount in amounts])
+        cumulative = _cumulative_amount(columns[first][mask], columns[last][mask], stacked, edges)
+        return np.diff(cumulative, axis=0).T
+
+    tx, lost, tx_bytes = per_bin('timeFirstTxPacket', 'timeLastTxPacket', ('txPackets', 'lostPackets', 'txBytes'), valid)
+    rx, rx_bytes = per_bin('timeFirstRxPacket', 'timeLastRxPacket', ('rxPackets', 'rxBytes'), valid_rx)
+
+    # Flujos transmitiendo al inicio de cada intervalo: empezados menos terminados
+    starts = np.sort(columns['timeFirstTxPacket'][valid])
+    ends = np.sort(columns['timeLastTxPacket'][valid])
+    active = np.searchsorted(starts, edges[:-1], side='right') - np.searchsorted(ends, edges[:-1], side='left')
+
+    width = np.diff(edges)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loss_rate = np.where(tx > 0, lost / tx * 100, np.nan)
+    return pd.DataFrame({
+        'Tiempo (s)': edges[:-1],
+        'Flujos_Activos': active,
+        'Paquetes_Ofrecidos': tx,
+        'Paquetes_Entregados': rx,
+        'Paquetes_Perdidos': lost,
+        'Carga_Ofrecida (pps)': tx / width,
+        'Carga_Entregada (pps)': rx / width,
+        'Throughput_Ofrecido (bps)': tx_bytes * 8 / width,
+        'Throughput_Entregado (bps)': rx_bytes * 8 / width,
+        'Tasa_Perdida (%)': np.clip(loss_rate, 0, 100),
+    })
+
+def loss_onset(df_series, threshold=FLOW_LOSS_THRESHOLD):
+    """Primer instante en que la tasa de pérdida alcanza ``threshold`` (%); NaN si nunca."""
+    above = df_series['Tasa_Perdida (%)'].to_numpy() >= threshold
+    return df_series['Tiempo (s)'].iloc[np.argmax(above)] if above.any() else np.nan
+
+@instrumented()
 def get_energy_summary(df):
     """Calcula el resumen de energía promedio."""
-    summary = df.groupby('Escenario_Completo')['Energia_Consumida(J)'].agg(['mean', 'sum']).reset_index()
+    if df.empty:
+        return pd.DataFrame(columns=['Escenario_Completo', 'Energia_Promedio(J)', 'Energia_Total(J)', 'Escenario', 'Tipo'])
+    summary = df.groupby(['Escenario_Completo', 'Escenario', 'Tipo'], observed=True)['Energia_Consumida(J)'].agg(['mean', 'sum']).reset_index()
     summary.rename(columns={'mean': 'Energia_Promedio(J)', 'sum': 'Energia_Total(J)'}, inplace=True)
-    summary[['Escenario', 'Tipo']] = summary['Escenario_Completo'].str.split(' - ', expand=True)
     
-    return summary
+    return summary[['Escenario_Completo', 'Energia_Promedio(J)', 'Energia_Total(J)', 'Escenario', 'Tipo']]
+
+# Métricas del cubo de comparación: columna -> frame de resumen del que sale
+CUBE_METRICS = {
+    'Energia_Promedio(J)': 'energia',
+    'Energia_Total(J)': 'energia',
+    'Retardo_Promedio (s)': 'metricas',
+    'Jitter_Promedio (s)': 'metricas',
+    'Bytes_x_Paquete': 'metricas',
+    'Paquetes_TX': 'metricas',
+    'Paquetes_RX': 'metricas',
+    'Paquetes_Perdidos': 'metricas',
+    'PDR (%)': 'metricas',
+    'Throughput (bps)': 'metricas',
+}
+
+class ComparisonCube:
+    """Cubo modo de seguridad x tipo de tráfico x métrica de los escenarios.
+
+    Se construye una sola vez a partir de los resúmenes por escenario (las
+    ejecuciones de un mismo modo y tipo se promedian) y guarda los valores en
+    un array de numpy, así que cada valor, diferencia o razón se consulta en
+    O(1) sin volver a filtrar los frames. Los modos y tipos salen de los datos,
+    no solo S/NS y Base/Ataque; las celdas sin escenario quedan como NaN.
+    """
+
+    def __init__(self, values, modes, types, metrics):
+        self.values = values
+        self.modes, self.types, self.metrics = list(modes), list(types), list(metrics)
+        self._index = (
+            {mode: i for i, mode in enumerate(self.modes)},
+            {tipo: i for i, tipo in enumerate(self.types)},
+            {metric: i for i, metric in enumerate(self.metrics)},
+        )
+
+    @classmethod
+    @instrumented('ComparisonCube.from_summaries')
+    def from_summaries(cls, df_energia_summary, df_metricas, metrics=CUBE_METRICS):
+        """Construye el cubo con la salida de get_energy_summary y la tabla de métricas."""
+        sources = {'energia': df_energia_summary, 'metricas': df_metricas}
+        cells = []
+        for source, df in sources.items():
+            columns = [metric for metric, origin in metrics.items() if origin == source and metric in df.columns]
+            if columns and not df.empty:
+                values = df[['Escenario', 'Tipo']].astype(object).join(df[columns].astype(float))
+                cells.append(values.groupby(['Escenario', 'Tipo'])[columns].mean())
+        table = pd.concat(cells, axis=1) if cells else pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=['Escenario', 'Tipo']))
+
+        # Orden estable: modo sin seguridad y tráfico base primero (son las referencias)
+        modes = sorted(table.index.unique(0), key=lambda m: (m != MODE_LABELS['NS'], m))
+        types = sorted(table.index.unique(1), key=lambda t: (t != 'Base', t))
+        table = table.reindex(pd.MultiIndex.from_product([modes, types]), columns=list(metrics))
+        values = table.to_numpy(dtype=float, na_value=np.nan).reshape(len(modes), len(types), len(metrics))
+        return cls(values, modes, types, metrics)
+
+    def value(self, modo, tipo, metrica):
+        """Valor de una celda (NaN si el modo, el tipo o la métrica no están)."""
+        i, j, k = (index.get(key) for index, key in zip(self._index, (modo, tipo, metrica)))
+        if i is None or j is None or k is None:
+            return np.nan
+        return self.values[i, j, k]
+
+    def delta(self, metrica, a, b):
+        """Diferencia a - b entre dos celdas dadas como (modo, tipo)."""
+        return self.value(*a, metrica) - self.value(*b, metrica)
+
+    def ratio(self, metrica, a, b):
+        """Razón a / b; infinito si la referencia es 0 y NaN si falta algún dato."""
+        num, den = self.value(*a, metrica), self.value(*b, metrica)
+        if pd.isna(num) or pd.isna(den):
+            return np.nan
+        return num / den if den > 0 else float('inf')
+
+    def pct_change(self, metrica, a, b):
+        """Cambio porcentual de a respecto a b (NaN si la referencia no es positiva)."""
+        den = self.value(*b, metrica)
+        return (self.value(*a, metrica) - den) / den * 100 if den > 0 else np.nan
+
+    def frame(self, metrics=None):
+        """Cubo como tabla: una fila por (modo, tipo) con datos y una columna por métrica."""
+        metrics = self.metrics if metrics is None else list(metrics)
+        columns = [self._index[2][metric] for metric in metrics]
+        grid = pd.MultiIndex.from_product([self.modes, self.types], names=['Escenario', 'Tipo'])
+        table = pd.DataFrame(self.values[:, :, columns].reshape(-1, len(columns)), index=grid, columns=metrics)
+        return table.dropna(how='all').reset_index()
 
-def load_netanim_data(file_key):
+    def compare(self, metrica, reference_mode=MODE_LABELS['NS'], reference_type='Base'):
+        """Tabla con cada celda de una métrica frente al modo y al tipo de referencia.
+
+        Para cada (modo, tipo): el valor, su cambio porcentual respecto al modo
+        de referencia con el mismo tipo de tráfico y su factor respecto al tipo
+        de referencia con el mismo modo (p. ej. amplificación del ataque).
+        """
+        k = self._index[2][metrica]
+        plane = self.values[:, :, k]
+        i, j = self._index[0].get(reference_mode), self._index[1].get(reference_type)
+        nan = np.full_like(plane, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            by_mode = nan if i is None else (plane - plane[i]) / np.where(plane[i] > 0, plane[i], np.nan) * 100
+            by_type = nan if j is None else plane / plane[:, [j]]
+        grid = pd.MultiIndex.from_product([self.modes, self.types], names=['Escenario', 'Tipo'])
+        return pd.DataFrame({
+            metrica: plane.ravel(),
+            f'Cambio_vs_{reference_mode} (%)': by_mode.ravel(),
+            f'Factor_vs_{reference_type}': by_type.ravel(),
+        }, index=grid).dropna(subset=[metrica]).reset_index()
+
+# Celdas (modo, tipo) que comparan los KPIs del resumen ejecutivo
+KPI_CELLS = [
+    (MODE_LABELS['S'], 'Base'), (MODE_LABELS['NS'], 'Base'),
+    (MODE_LABELS['S'], 'Ataque'), (MODE_LABELS['NS'], 'Ataque'),
+]
+
+def kpi_scenarios(registry, selected=None):
+    """Escenarios del registro que alimentan los KPIs (los de las celdas de KPI_CELLS).
+
+    Con ``selected`` se toman de las mismas ejecuciones que los escenarios
+    seleccionados; una celda que no aparece en esas ejecuciones se completa con
+    todas las ejecuciones que la tienen.
+    """
+    in_cell = pd.MultiIndex.from_frame(registry[['Escenario', 'Tipo']]).isin(KPI_CELLS)
+    candidates = registry[in_cell].drop_duplicates('Escenario_Completo')
+    if selected is not None:
+        runs = registry.loc[registry['Escenario_Completo'].isin(list(selected)), 'Ejecucion']
+        chosen = candidates[candidates['Ejecucion'].isin(runs)]
+        covered = set(zip(chosen['Escenario'], chosen['Tipo']))
+        missing = [(escenario, tipo) not in covered for escenario, tipo in zip(candidates['Escenario'], candidates['Tipo'])]
+        candidates = pd.concat([chosen, candidates[missing]])
+    return sorted(candidates['Escenario_Completo'].unique())
+
+@instrumented()
+def compute_kpis(df_energia_summary, df_metricas, cube=None):
+    """Calcula los KPIs del resumen ejecutivo (S vs NS, Base vs Ataque).
+
+    No depende de Streamlit, así que la usan tanto la app como el reporte por
+    lotes. Los valores salen del cubo de comparación (se construye si no se
+    pasa uno); los que no se pueden calcular por falta de escenarios quedan
+    como NaN.
+    """
+    cube = ComparisonCube.from_summaries(df_energia_summary, df_metricas) if cube is None else cube
+    s_base, ns_base = (MODE_LABELS['S'], 'Base'), (MODE_LABELS['NS'], 'Base')
+    s_attk, ns_attk = (MODE_LABELS['S'], 'Ataque'), (MODE_LABELS['NS'], 'Ataque')
+    energia = 'Energia_Promedio(J)'
+
+    def perdidos(cell):
+        value = cube.value(*cell, 'Paquetes_Perdidos')
+        return 0 if pd.isna(value) else int(round(value))
+
+    if df_metricas.empty:
+        worst_delay, scenario_worst = np.nan, None
+    else:
+        worst = df_metricas.loc[df_metricas['Retardo_Promedio (s)'].idxmax()]
+        worst_delay, scenario_worst = worst['Retardo_Promedio (s)'], worst['Escenario_Completo']
+
+    return {
+        'Energia_S_Base (J)': cube.value(*s_base, energia),
+        'Energia_NS_Base (J)': cube.value(*ns_base, energia),
+        'Energia_S_Ataque (J)': cube.value(*s_attk, energia),
+        'Energia_NS_Ataque (J)': cube.value(*ns_attk, energia),
+        'Ahorro_Energia_Ataque (J)': cube.delta(energia, ns_attk, s_attk),
+        'Ahorro_Energia_Ataque (%)': -cube.pct_change(energia, s_attk, ns_attk),
+        'Aumento_Energia_Base (%)': cube.pct_change(energia, s_base, ns_base),
+        'Sobrecarga_Seguridad (Bytes)': cube.delta('Bytes_x_Paquete', s_base, ns_base),
+        'Factor_Ataque_S': cube.ratio(energia, s_attk, s_base),
+        'Factor_Ataque_NS': cube.ratio(energia, ns_attk, ns_base),
+        'Paquetes_Perdidos_S_Ataque': perdidos(s_attk),
+        'Paquetes_Perdidos_NS_Ataque': perdidos(ns_attk),
+        'Peor_Retardo_Promedio (s)': worst_delay,
+        'Escenario_Peor_Retardo': scenario_worst,
+    }
+
+def load_netanim_data(file_path):
     """Carga y procesa datos de animación NetAnim para Plotly."""
-    file_path = FILES[file_key]
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    
-    motion_data = []
-
-    # 1. Obtener posiciones iniciales (tiempo 0)
-    for node in root.findall('node'):
-        node_id = int(node.get('id'))
-        pos = {
-            'X': float(node.get('locX')),
-            'Y': float(node.get('locY'))
-        }
-        motion_data.append({'Time': 0.0, 'Node_ID': node_id, 'X': pos['X'], 'Y': pos['Y']})
-
-    # 2. Procesar movimientos
-    for move in root.findall('move'):
-        node_id = int(move.get('id'))
-        time = float(move.get('time'))
-        
-        locX_str = move.get('locX')
-        locY_str = move.get('locY')
-        
-        if locX_str is not None and locY_str is not None:
-            motion_data.append({
-                'Time': time,
-                'Node_ID': node_id,
-                'X': float(locX_str),
-                'Y': float(locY_str)
-            })
+    return load_cached(parse_netanim_file, file_path)
 
-    df = pd.DataFrame(motion_data)
-    
-    if df.empty:
+@instrumented()
+def parse_netanim_file(file_path):
+    """Parsea en streaming un XML de NetAnim como eventos de posición (Time, Node_ID, X, Y).
+
+    Solo se guardan los eventos (posición inicial de cada <node> y cada <move>),
+    ordenados por nodo y tiempo en columnas tipadas; no se materializa ningún
+    fotograma. Las posiciones en un instante se obtienen con netanim_positions_at.
+    """
+    times = array('d')
+    node_ids = array('i')
+    xs = array('f')
+    ys = array('f')
+
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = elem
+            continue
+
+        if depth == 2:
+            # 1. Posiciones iniciales (tiempo 0) y 2. movimientos
+            if elem.tag == 'node':
+                time, loc_x, loc_y = 0.0, elem.get('locX'), elem.get('locY')
+            elif elem.tag == 'move':
+                time, loc_x, loc_y = float(elem.get('time')), elem.get('locX'), elem.get('locY')
+            else:
+                loc_x = loc_y = None
+
+            if loc_x is not None and loc_y is not None:
+                times.append(time)
+                node_ids.append(int(elem.get('id')))
+                xs.append(float(loc_x))
+                ys.append(float(loc_y))
+            root.clear()
+        depth -= 1
+
+    df = pd.DataFrame({
+        'Time': np.frombuffer(times, dtype=np.float64),
+        'Node_ID': np.frombuffer(node_ids, dtype=np.int32),
+        'X': np.frombuffer(xs, dtype=np.float32),
+        'Y': np.frombuffer(ys, dtype=np.float32),
+    })
+    # Orden estable por (nodo, tiempo): ante eventos simultáneos gana el último del archivo
+    order = np.lexsort((df['Time'].to_numpy(), df['Node_ID'].to_numpy()))
+    return df.iloc[order].reset_index(drop=True)
+
+def _node_segments(df_events, node_column='Node_ID'):
+    """Inicio y fin de los eventos de cada nodo en un DataFrame ordenado por (nodo, tiempo)."""
+    node_ids, starts = np.unique(df_events[node_column].to_numpy(), return_index=True)
+    ends = np.append(starts[1:], len(df_events))
+    return node_ids, starts, ends
+
+def netanim_positions_at(df_events, t, interpolate=False):
+    """Posición de cada nodo en el instante t (último evento con Time <= t).
+
+    Con ``interpolate`` la posición se interpola linealmente hacia el siguiente
+    evento. Los nodos sin eventos hasta t no aparecen en el resultado.
+    """
+    return netanim_frames(df_events, [t], interpolate).drop(columns='Time')
+
+def netanim_frames(df_events, times=None, interpolate=False):
+    """Posiciones de todos los nodos en cada instante indicado.
+
+    Por defecto usa los tiempos de los eventos, equivalente a rellenar hacia
+    adelante la tabla Time x Node_ID pero sin construirla a partir de los
+    eventos. Los segmentos de cada nodo se calculan una vez y el último evento
+    con Time <= t se busca con un solo searchsorted por nodo sobre todos los
+    instantes: O(nodos x instantes x log eventos). Con ``interpolate`` la
+    posición se interpola linealmente hacia el siguiente evento del nodo.
+    """
+    if df_events.empty:
         return pd.DataFrame(columns=['Time', 'Node_ID', 'X', 'Y'])
-        
-    # Llenar movimientos faltantes (nodos estáticos) para la animación fluida
-    df = df.sort_values(by=['Node_ID', 'Time']).reset_index(drop=True)
-    df_pivot = df.pivot(index='Time', columns='Node_ID', values=['X', 'Y'])
-    df_pivot = df_pivot.fillna(method='ffill') 
-    
-    df_motion = df_pivot.stack(level=1, dropna=False).reset_index()
-    df_motion.columns = ['Time', 'Node_ID', 'X', 'Y']
-    
-    return df_motion
+    event_times = df_events['Time'].to_numpy()
+    times = np.unique(event_times) if times is None else np.asarray(times)
+    node_ids, starts, ends = _node_segments(df_events)
 
+    # Fila del último evento de cada nodo en cada instante (instantes x nodos)
+    last = np.empty((len(times), len(node_ids)), dtype=np.int64)
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        last[:, k] = start + np.searchsorted(event_times[start:end], times, side='right') - 1
+    # Los nodos sin eventos hasta t no aparecen en ese instante; orden por (instante, nodo)
+    valid = last >= starts
+    rows = last[valid]
+    t = np.broadcast_to(times[:, None], last.shape)[valid]
+    nodes = np.broadcast_to(np.arange(len(node_ids)), last.shape)[valid]
+    xs = df_events['X'].to_numpy()
+    ys = df_events['Y'].to_numpy()
+    x, y = xs[rows], ys[rows]
 
-def load_all_data():
-    """Carga y procesa todos los datos para la aplicación (Energía, Métricas, Histogramas)."""
-    
-    # 1. Carga de Energía
-    df_list = []
-    for k in FILES:
-        if 'ENERGIA' in k:
-            try:
-                df_list.append(load_energy_data(k))
-            except Exception as e:
-                # print(f"Error al cargar el archivo de energía {FILES[k]}: {e}")
-                pass
-                
-    if not df_list:
-        df_energia = pd.DataFrame(columns=['Nodo_ID', 'Energia_Consumida(J)', 'Escenario', 'Tipo', 'Escenario_Completo'])
-    else:
-        df_energia = pd.concat(df_list, ignore_index=True)
+    if interpolate:
+        nxt = np.minimum(rows + 1, len(event_times) - 1)
+        has_next = (rows + 1) < ends[nodes]
+        span = np.where(has_next, event_times[nxt] - event_times[rows], 1.0)
+        frac = np.where(has_next & (span > 0), (t - event_times[rows]) / np.where(span > 0, span, 1.0), 0.0)
+        x = x + (xs[nxt] - x) * frac.astype(np.float32)
+        y = y + (ys[nxt] - y) * frac.astype(np.float32)
+
+    return pd.DataFrame({'Time': t, 'Node_ID': node_ids[nodes], 'X': x, 'Y': y})
+
+def netanim_frame_times(df_events, fps=None, max_frames=ANIM_MAX_FRAMES):
+    """Instantes de los fotogramas: ``fps`` por segundo simulado, como mucho ``max_frames``."""
+    if df_events.empty:
+        return np.empty(0)
+    t_start, t_end = df_events['Time'].min(), df_events['Time'].max()
+    n_frames = max_frames if fps is None else int((t_end - t_start) * fps) + 1
+    n_frames = max(1, min(n_frames, max_frames))
+    # Redondeo a milisegundos para que las etiquetas del slider sean legibles
+    return np.unique(np.round(np.linspace(t_start, t_end, n_frames), 3))
+
+@instrumented()
+def resample_netanim(df_events, fps=None, max_frames=ANIM_MAX_FRAMES, max_points=None):
+    """Remuestrea el movimiento a una rejilla regular de fotogramas, interpolando posiciones.
+
+    Con ``max_points`` el resultado (fotogramas x nodos) nunca lo supera: se
+    reducen los fotogramas y, si no caben ANIM_MIN_FRAMES con todos los nodos,
+    se toma una muestra regular de los nodos. ``attrs['nodos']`` guarda los
+    nodos totales y ``attrs['nodos_mostrados']`` los que quedan.
+    """
+    node_ids = np.unique(df_events['Node_ID'].to_numpy())
+    n_nodes = len(node_ids)
+    if max_points is not None and n_nodes:
+        max_points = max(1, int(max_points))
+        if max_points // n_nodes < min(max_frames, ANIM_MIN_FRAMES):
+            # 1. Ni siquiera caben los fotogramas mínimos: muestra regular de nodos
+            max_frames = max(1, min(max_frames, ANIM_MIN_FRAMES, max_points))
+            keep = node_ids[np.linspace(0, n_nodes - 1, max_points // max_frames).astype(np.int64)]
+            df_events = df_events[df_events['Node_ID'].isin(keep)]
+            n_nodes = len(keep)
+        # 2. Fotogramas que caben con los nodos que quedan
+        max_frames = max(1, min(max_frames, max_points // n_nodes))
+
+    times = netanim_frame_times(df_events, fps, max_frames)
+    if max_points is not None and len(times) * n_nodes > max_points:
+        raise ValueError(f'{len(times)} fotogramas x {n_nodes} nodos superan el límite de {max_points} puntos')
+    df_frames = netanim_frames(df_events, times, interpolate=True)
+    df_frames.attrs.update(nodos=len(node_ids), nodos_mostrados=n_nodes)
+    return df_frames
+
+class SpatialIndex:
+    """Índice espacial por instantes (rejilla uniforme) de las posiciones de los nodos.
+
+    Se construye una vez por escenario: toma las posiciones de todos los nodos
+    en ``times`` (por defecto hasta SPATIAL_MAX_SLICES instantes repartidos en
+    la simulación), asigna cada una a una celda de la rejilla y ordena todas
+    las filas por (instante, celda), con offsets tipo CSR por celda. Una
+    consulta solo mira las celdas que toca la región, así que el coste depende
+    de los nodos cercanos y no del total. Si se pasa el reporte de energía, cada
+    nodo lleva su ``Energia_Consumida(J)`` para agregarla por región.
+    """
+
+    def __init__(self, df_events, df_energy=None, times=None, cell_size=None):
+        self.times = netanim_frame_times(df_events, max_frames=SPATIAL_MAX_SLICES) if times is None else np.asarray(times)
+        if not len(self.times):
+            # Sin eventos: un único instante vacío, así las consultas devuelven frames vacíos
+            self.times = np.zeros(1)
+        frames = netanim_frames(df_events, self.times)
+        slice_ids = np.searchsorted(self.times, frames['Time'].to_numpy())
+        x, y = frames['X'].to_numpy(np.float64), frames['Y'].to_numpy(np.float64)
+        nodes = frames['Node_ID'].to_numpy()
+
+        # 1. Rejilla: celdas cuadradas con unos SPATIAL_NODES_PER_CELL nodos cada una
+        self.x0, self.y0 = (x.min(), y.min()) if len(x) else (0.0, 0.0)
+        width, height = (x.max() - self.x0, y.max() - self.y0) if len(x) else (0.0, 0.0)
+        if cell_size is None:
+            n_nodes = max(1, len(np.unique(nodes)))
+            cell_size = max(width, height) / max(1.0, np.sqrt(n_nodes / SPATIAL_NODES_PER_CELL))
+        self.cell_size = float(cell_size) if cell_size > 0 else 1.0
+        self.nx = int(width // self.cell_size) + 1
+        self.ny = int(height // self.cell_size) + 1
+        n_cells = self.nx * self.ny
+
+        # 2. Filas ordenadas por (instante, celda) y offsets de cada celda
+        cells = slice_ids * n_cells + self._cell_of(x, y)
+        order = np.argsort(cells, kind='stable')
+        self.offsets = np.searchsorted(cells[order], np.arange(len(self.times) * n_cells + 1))
+        self.x, self.y, self.nodes = x[order], y[order], nodes[order]
+
+        # 3. Energía consumida por nodo (NaN si el nodo no está en el reporte)
+        self.energy = np.full(len(order), np.nan)
+        if df_energy is not None and not df_energy.empty:
+            energy = df_energy.groupby('Nodo_ID', observed=True)['Energia_Consumida(J)'].sum()
+            energy_ids = energy.index.to_numpy()
+            pos = np.clip(np.searchsorted(energy_ids, self.nodes), 0, len(energy_ids) - 1)
+            found = energy_ids[pos] == self.nodes
+            self.energy[found] = energy.to_numpy(np.float64)[pos[found]]
+
+    def _cell_of(self, x, y):
+        cx = np.clip(((x - self.x0) // self.cell_size).astype(np.int64), 0, self.nx - 1)
+        cy = np.clip(((y - self.y0) // self.cell_size).astype(np.int64), 0, self.ny - 1)
+        return cy * self.nx + cx
+
+    def slice_at(self, t):
+        """Índice del instante del índice vigente en t (el último <= t)."""
+        return int(np.clip(np.searchsorted(self.times, t, side='right') - 1, 0, max(len(self.times) - 1, 0)))
 
-    # 2. Carga y Consolidación de Métricas (FlowMonitor)
-    metricas_data = []
+    def _slice_rows(self, t):
+        base = self.slice_at(t) * self.nx * self.ny
+        return self.offsets[base], self.offsets[base + self.nx * self.ny]
+
+    def positions_at(self, t):
+        """Posición y energía de todos los nodos en el instante del índice vigente en t."""
+        lo, hi = self._slice_rows(t)
+        return pd.DataFrame({
+            'Node_ID': self.nodes[lo:hi], 'X': self.x[lo:hi], 'Y': self.y[lo:hi],
+            'Energia_Consumida(J)': self.energy[lo:hi],
+        })
+
+    def node_position(self, node_id, t):
+        """(X, Y) de un nodo en t, o None si el nodo no tiene posición en ese instante."""
+        lo, hi = self._slice_rows(t)
+        match = np.flatnonzero(self.nodes[lo:hi] == node_id)
+        if not len(match):
+            return None
+        return self.x[lo + match[0]], self.y[lo + match[0]]
+
+    def _candidate_rows(self, t, x_min, x_max, y_min, y_max):
+        """Filas de las celdas que cubren el rectángulo (un tramo contiguo por fila de celdas)."""
+        base = self.slice_at(t) * self.nx * self.ny
+        cx0, cx1 = (np.clip(int((v - self.x0) // self.cell_size), 0, self.nx - 1) for v in (x_min, x_max))
+        cy0, cy1 = (np.clip(int((v - self.y0) // self.cell_size), 0, self.ny - 1) for v in (y_min, y_max))
+        ranges = [
+            np.arange(self.offsets[base + cy * self.nx + cx0], self.offsets[base + cy * self.nx + cx1 + 1])
+            for cy in range(cy0, cy1 + 1)
+        ]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def within_radius(self, x, y, radius, t):
+        """Nodos a distancia <= radius de (x, y) en t, del más cercano al más lejano."""
+        rows = self._candidate_rows(t, x - radius, x + radius, y - radius, y + radius)
+        distance = np.hypot(self.x[rows] - x, self.y[rows] - y)
+        inside = distance <= radius
+        rows, distance = rows[inside], distance[inside]
+        order = np.argsort(distance, kind='stable')
+        return pd.DataFrame({
+            'Node_ID': self.nodes[rows[order]], 'X': self.x[rows[order]], 'Y': self.y[rows[order]],
+            'Distancia': distance[order], 'Energia_Consumida(J)': self.energy[rows[order]],
+        })
+
+    def nearest(self, x, y, k, t):
+        """Los k nodos más cercanos a (x, y) en t (amplía el radio celda a celda)."""
+        lo, hi = self._slice_rows(t)
+        k = min(k, hi - lo)
+        radius = self.cell_size
+        while True:
+            found = self.within_radius(x, y, radius, t)
+            # El radio cubre toda la rejilla: no hay más nodos que buscar
+            if len(found) >= k or radius > self.cell_size * (self.nx + self.ny):
+                return found.head(k)
+            radius *= 2
+
+    def in_box(self, x_min, x_max, y_min, y_max, t):
+        """Nodos dentro del rectángulo [x_min, x_max] x [y_min, y_max] en t."""
+        rows = self._candidate_rows(t, x_min, x_max, y_min, y_max)
+        inside = (self.x[rows] >= x_min) & (self.x[rows] <= x_max) & (self.y[rows] >= y_min) & (self.y[rows] <= y_max)
+        rows = rows[inside]
+        return pd.DataFrame({
+            'Node_ID': self.nodes[rows], 'X': self.x[rows], 'Y': self.y[rows],
+            'Energia_Consumida(J)': self.energy[rows],
+        })
+
+    def grid_energy(self, t):
+        """Energía consumida por celda en t como matriz (ny, nx), con los centros de las celdas.
+
+        Devuelve (energía, centros_x, centros_y); las celdas sin nodos quedan en 0.
+        """
+        base = self.slice_at(t) * self.nx * self.ny
+        lo, hi = self._slice_rows(t)
+        cell_ids = np.repeat(np.arange(self.nx * self.ny), np.diff(self.offsets[base:base + self.nx * self.ny + 1]))
+        energy = np.bincount(cell_ids, weights=np.nan_to_num(self.energy[lo:hi]), minlength=self.nx * self.ny)
+        centers_x = self.x0 + (np.arange(self.nx) + 0.5) * self.cell_size
+        centers_y = self.y0 + (np.arange(self.ny) + 0.5) * self.cell_size
+        return energy.reshape(self.ny, self.nx), centers_x, centers_y
+
+@instrumented()
+def load_energy_trace(file_path, chunksize=TRACE_CHUNK_ROWS):
+    """Carga por bloques una traza de energía (Tiempo(s), Nodo_ID, Energia_Restante(J)).
+
+    Cada bloque se convierte a arrays tipados (float64 para el tiempo, int32
+    para el nodo y float32 para la energía) y al final las muestras se ordenan
+    por (nodo, tiempo), de modo que la serie de cada nodo es un tramo contiguo.
+    """
+    chunks = pd.read_csv(
+        file_path, usecols=TRACE_COLUMNS, chunksize=chunksize,
+        dtype={'Tiempo(s)': np.float64, 'Nodo_ID': np.int32, 'Energia_Restante(J)': np.float32}
+    )
+    times, node_ids, energy = [], [], []
+    for chunk in chunks:
+        times.append(chunk['Tiempo(s)'].to_numpy())
+        node_ids.append(chunk['Nodo_ID'].to_numpy())
+        energy.append(chunk['Energia_Restante(J)'].to_numpy())
+
+    df = pd.DataFrame({
+        'Tiempo(s)': np.concatenate(times) if times else np.empty(0, np.float64),
+        'Nodo_ID': np.concatenate(node_ids) if node_ids else np.empty(0, np.int32),
+        'Energia_Restante(J)': np.concatenate(energy) if energy else np.empty(0, np.float32),
+    })
+    order = np.lexsort((df['Tiempo(s)'].to_numpy(), df['Nodo_ID'].to_numpy()))
+    return df.iloc[order].reset_index(drop=True)
+
+def lttb_downsample(x, y, n_out):
+    """Índices de los puntos elegidos por Largest-Triangle-Three-Buckets.
+
+    Conserva el primer y el último punto y, en cada bucket intermedio, el que
+    forma el triángulo de mayor área con el punto anterior elegido y el
+    promedio del bucket siguiente; mantiene la forma visual de la serie.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Promedio del bucket siguiente (el último bucket usa el punto final)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+def minmax_downsample(x, y, n_out):
+    """Índices del mínimo y el máximo de ``y`` en cada uno de ``n_out // 2`` buckets."""
+    n = len(x)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    buckets = np.arange(n) * (n_out // 2) // n
+    # Orden por (bucket, y): el primero de cada bucket es el mínimo y el último el máximo
+    order = np.lexsort((y, buckets))
+    starts = np.searchsorted(buckets[order], np.arange(n_out // 2))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+TRACE_DOWNSAMPLERS = {'lttb': lttb_downsample, 'minmax': minmax_downsample}
+
+@instrumented()
+def downsample_traces(df_trace, nodes=None, max_points=TRACE_MAX_POINTS, method='lttb'):
+    """Reduce la serie de cada nodo a ``max_points`` puntos antes de graficarla.
+
+    ``df_trace`` debe estar ordenado por (nodo, tiempo) como lo devuelve
+    load_energy_trace; cada nodo se recorta con su tramo contiguo, sin filtrar
+    el frame completo.
+    """
+    downsample = TRACE_DOWNSAMPLERS[method]
+    node_ids, starts, ends = _node_segments(df_trace, 'Nodo_ID')
+    wanted = node_ids if nodes is None else np.intersect1d(node_ids, np.asarray(list(nodes)))
+    times = df_trace['Tiempo(s)'].to_numpy()
+    energy = df_trace['Energia_Restante(J)'].to_numpy()
+
+    rows = []
+    for pos in np.searchsorted(node_ids, wanted):
+        start, end = starts[pos], ends[pos]
+        rows.append(start + downsample(times[start:end], energy[start:end].astype(np.float64), max_points))
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+    return df_trace.iloc[rows].reset_index(drop=True)
+
+@instrumented()
+def trace_envelope(df_trace, n_bins=TRACE_MAX_POINTS):
+    """Mínimo, promedio y máximo de la energía de todos los nodos por intervalo de tiempo."""
+    times = df_trace['Tiempo(s)'].to_numpy()
+    energy = df_trace['Energia_Restante(J)'].to_numpy(dtype=np.float64)
+    if len(times) == 0:
+        return pd.DataFrame(columns=['Tiempo(s)', 'Energia_Min(J)', 'Energia_Promedio(J)', 'Energia_Max(J)'])
+
+    edges = np.linspace(times.min(), times.max(), n_bins + 1)
+    bins = np.clip(np.searchsorted(edges, times, side='right') - 1, 0, n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    minimum = np.full(n_bins, np.inf)
+    maximum = np.full(n_bins, -np.inf)
+    np.minimum.at(minimum, bins, energy)
+    np.maximum.at(maximum, bins, energy)
+    used = counts > 0
+    return pd.DataFrame({
+        'Tiempo(s)': ((edges[:-1] + edges[1:]) / 2)[used],
+        'Energia_Min(J)': minimum[used],
+        'Energia_Promedio(J)': (np.bincount(bins, weights=energy, minlength=n_bins)[used] / counts[used]),
+        'Energia_Max(J)': maximum[used],
+    })
+
+# Loader de cada clase de archivo del registro
+CLASS_LOADERS = {'ENERGIA': pd.read_csv, 'METRICAS': load_flow_stats, 'ANIM': parse_netanim_file}
+
+ENERGIA_COLUMNS = ['Nodo_ID', 'Energia_Consumida(J)', 'Escenario', 'Tipo', 'Escenario_Completo']
+NETANIM_COLUMNS = ['Time', 'Node_ID', 'X', 'Y', 'Escenario_Completo']
+SCENARIO_KEYS = ['Escenario', 'Tipo', 'Escenario_Completo']
+
+def _energy_part(row, result):
+    """Filas de energía aportadas por un archivo del registro."""
+    return add_scenario_columns(result, row.Escenario, row.Tipo, row.Escenario_Completo)
+
+def _flow_part(row, result):
+    """Flujos (con la 5-tupla del clasificador) e histogramas del archivo de métricas como SparseHistogram."""
+    df_flows, df_bins, df_classifier = result
+    df_flows = df_flows.merge(df_classifier, on='flowId', how='left')
+    df_flows.insert(0, 'Escenario_Completo', row.Escenario_Completo)
+    df_flows.insert(0, 'Tipo', row.Tipo)
+    df_flows.insert(0, 'Escenario', row.Escenario)
+
+    hists = {}
+    for metrica, group in df_bins.groupby('Métrica', observed=True):
+        hists[metrica] = bins_to_histogram(group['Rango_Inicio (s)'], group['Rango_Ancho (s)'], group['Conteo'])
+    return df_flows, hists
+
+def _scenario_part(row, result):
+    """Filas de un archivo (animación, traza de energía o sondas) con su escenario."""
+    result['Escenario_Completo'] = row.Escenario_Completo
+    return result
+
+def _merge_scenario_histograms(metric_files, flow_parts):
+    """Histogramas fusionados por (escenario, métrica): memoria O(bins), no O(flujos x bins)."""
+    scenario_hists = {}
+    for row in metric_files.itertuples(index=False):
+        if row.Archivo not in flow_parts:
+            continue
+        for metrica, hist in flow_parts[row.Archivo][1].items():
+            key = (row.Escenario_Completo, metrica)
+            scenario_hists[key] = merge_histograms([scenario_hists[key], hist]) if key in scenario_hists else hist
+    return scenario_hists
+
+def _scenario_metrics(df_flujos, scenario_hists):
+    """Métricas por escenario agregadas sobre todos los flujos, con percentiles de retardo."""
+    df_metricas = aggregate_flows(df_flujos, by=SCENARIO_KEYS)
+    return _add_delay_percentiles(df_metricas, scenario_hists)
+
+def _add_delay_percentiles(df_metricas, scenario_hists):
+    """Añade los percentiles de retardo de cada escenario a partir de su histograma fusionado."""
+    for q in DELAY_QUANTILES:
+        df_metricas[f'Retardo_P{q * 100:g} (s)'] = [
+            histogram_quantile(scenario_hists[(escenario, 'Delay')], [q])[q]
+            if (escenario, 'Delay') in scenario_hists else np.nan
+            for escenario in df_metricas['Escenario_Completo']
+        ]
+    return df_metricas
+
+def _histograms_frame(scenario_hists):
+    """Histogramas por escenario (suma de los bins de todos los flujos) en formato largo."""
     hist_data = []
-    
-    for key in FILES:
-        if 'METRICAS' in key:
+    for (escenario, metrica), hist in sorted(scenario_hists.items()):
+        df_hist = histogram_to_frame(hist)
+        df_hist.insert(0, 'Métrica', metrica)
+        df_hist.insert(0, 'Escenario_Completo', escenario)
+        hist_data.append(df_hist)
+    return pd.concat(hist_data, ignore_index=True) if hist_data else pd.DataFrame(columns=HIST_COLUMNS)
+
+def _concat_parts(files, parts, columns):
+    """Concatena las partes por archivo en el orden del registro."""
+    frames = [parts[path] for path in files['Archivo'] if path in parts]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def _concat_typed(frames, columns):
+    """Concatena frames ya tipados conservando las columnas categóricas (unión de sus categorías)."""
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return apply_schema(pd.DataFrame(columns=columns))
+    for column in frames[0].columns.intersection(CATEGORY_COLUMNS):
+        dtypes = [df[column].dtype for df in frames]
+        if all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes) and any(dtype != dtypes[0] for dtype in dtypes):
+            categories = sorted(set().union(*(dtype.categories for dtype in dtypes)))
+            frames = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+@instrumented()
+def load_all_data(registry=None, scenarios=None, workers=None):
+    """Carga y procesa todos los datos para la aplicación (Energía, Métricas, Histogramas).
+
+    Solo se abren los archivos de los escenarios indicados (todos si es None).
+    Devuelve también la lista de errores por archivo, para mostrarlos en la app.
+    """
+    registry = discover_scenarios() if registry is None else registry
+    energy_files = registry_files(registry, 'ENERGIA', scenarios)
+    metric_files = registry_files(registry, 'METRICAS', scenarios)
+
+    # 1. Parseo en paralelo de todos los archivos (CSV de energía y XML de FlowMonitor)
+    tasks = [(pd.read_csv, path) for path in energy_files['Archivo']]
+    tasks += [(load_flow_stats, path) for path in metric_files['Archivo']]
+    results, errores = load_files(tasks, workers)
+
+    # 2. Consolidación de Energía
+    energy_parts = {
+        row.Archivo: _energy_part(row, results[row.Archivo])
+        for row in energy_files.itertuples(index=False) if row.Archivo in results
+    }
+    df_energia = _concat_parts(energy_files, energy_parts, ENERGIA_COLUMNS)
+
+    # 3. Consolidación de todos los flujos (FlowMonitor + 5-tupla del clasificador)
+    flow_parts = {
+        row.Archivo: _flow_part(row, results[row.Archivo])
+        for row in metric_files.itertuples(index=False) if row.Archivo in results
+    }
+    df_flujos = _concat_parts(metric_files, {path: part[0] for path, part in flow_parts.items()}, FLUJOS_COLUMNS)
+    scenario_hists = _merge_scenario_histograms(metric_files, flow_parts)
+
+    # 4. Métricas por escenario y 5. histogramas por escenario
+    df_metricas = _scenario_metrics(df_flujos, scenario_hists)
+    df_histograms = _histograms_frame(scenario_hists)
+
+    # 6. Esquema tipado común (categorías de escenario compartidas por todos los frames)
+    frames = df_energia, df_metricas, df_histograms, df_flujos
+    scenarios = registry['Escenario_Completo'].unique()
+    return (*(apply_schema(df, scenarios) for df in frames), list(errores.values()))
+
+@instrumented()
+def load_all_netanim_data(registry=None, scenarios=None, workers=None):
+    """Carga los datos de animación de los escenarios indicados y los errores por archivo."""
+    registry = discover_scenarios() if registry is None else registry
+    anim_files = registry_files(registry, 'ANIM', scenarios)
+    results, errores = load_files([(parse_netanim_file, path) for path in anim_files['Archivo']], workers)
+
+    parts = {
+        row.Archivo: _scenario_part(row, results[row.Archivo])
+        for row in anim_files.itertuples(index=False) if row.Archivo in results
+    }
+    return apply_schema(_concat_parts(anim_files, parts, NETANIM_COLUMNS), registry['Escenario_Completo'].unique()), list(errores.values())
+
+@instrumented()
+def load_all_energy_traces(registry=None, scenarios=None, workers=None):
+    """Carga las trazas de energía en el tiempo de los escenarios indicados y los errores por archivo."""
+    registry = discover_scenarios() if registry is None else registry
+    trace_files = registry_files(registry, 'TRAZA', scenarios)
+    results, errores = load_files([(load_energy_trace, path) for path in trace_files['Archivo']], workers)
+
+    parts = {
+        row.Archivo: _scenario_part(row, results[row.Archivo])
+        for row in trace_files.itertuples(index=False) if row.Archivo in results
+    }
+    df = _concat_parts(trace_files, parts, TRACE_COLUMNS + ['Escenario_Completo'])
+    return apply_schema(df, registry['Escenario_Completo'].unique()), list(errores.values())
+
+@instrumented()
+def load_all_flow_probes(registry=None, scenarios=None, workers=None):
+    """Carga las entradas de FlowProbes de los escenarios indicados y los errores por archivo."""
+    registry = discover_scenarios() if registry is None else registry
+    metric_files = registry_files(registry, 'METRICAS', scenarios)
+    results, errores = load_files([(load_flow_probes, path) for path in metric_files['Archivo']], workers)
+
+    parts = {
+        row.Archivo: _scenario_part(row, results[row.Archivo])
+        for row in metric_files.itertuples(index=False) if row.Archivo in results
+    }
+    df = _concat_parts(metric_files, parts, PROBE_COLUMNS + ['Escenario_Completo'])
+    return apply_schema(df, registry['Escenario_Completo'].unique()), list(errores.values())
+
+class RunningStats:
+    """Media y varianza en streaming (Welford) de un vector de métricas.
+
+    Cada ``update`` añade una observación (un valor por métrica); los NaN se
+    ignoran en su métrica. No guarda las observaciones.
+    """
+
+    def __init__(self, n_metrics):
+        self.n = np.zeros(n_metrics)
+        self.mean = np.zeros(n_metrics)
+        self.m2 = np.zeros(n_metrics)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self.n[valid] += 1
+        delta = values[valid] - self.mean[valid]
+        self.mean[valid] += delta / self.n[valid]
+        self.m2[valid] += delta * (values[valid] - self.mean[valid])
+
+    @property
+    def variance(self):
+        """Varianza muestral (NaN con menos de dos observaciones)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.n > 1, self.m2 / (self.n - 1), np.nan)
+
+def t_quantile(p, dof):
+    """Cuantil p de la t de Student con ``dof`` grados de libertad (sin SciPy).
+
+    Exacto para 1 y 2 grados de libertad; para más usa la expansión de
+    Cornish-Fisher sobre el cuantil normal (error < 0.01 desde 3 grados).
+    """
+    if dof < 1:
+        return np.nan
+    if dof == 1:
+        return float(np.tan(np.pi * (p - 0.5)))
+    if dof == 2:
+        return (2 * p - 1) / np.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    return (z + (z ** 3 + z) / (4 * dof)
+            + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+            + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3)
+            + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * dof ** 4))
+
+def replicate_kpis(run_registry):
+    """KPIs de una ejecución (réplica) por (Escenario, Tipo); se ejecuta en un proceso del pool.
+
+    Devuelve solo la tabla pequeña de REPLICATE_METRICS y los errores; los
+    frames de la ejecución se descartan al terminar.
+    """
+    df_energia, df_metricas, _, _, errores = load_all_data(run_registry, workers=1)
+    cube = ComparisonCube.from_summaries(get_energy_summary(df_energia), df_metricas)
+    return cube.frame(REPLICATE_METRICS), errores
+
+@instrumented()
+def aggregate_replicates(registry=None, scenarios=None, workers=None,
+                         confidence=REPLICATE_CONFIDENCE, n_bootstrap=REPLICATE_BOOTSTRAP, seed=0):
+    """Agrega los KPIs de las réplicas (ejecuciones) de cada configuración S/NS x Base/Ataque.
+
+    Cada ejecución del registro (columna ``Ejecucion``) se carga en un proceso
+    del pool y sus KPIs se reducen al llegar con RunningStats, así que nunca
+    hay más de una réplica completa en memoria por proceso. Solo se guardan
+    los KPIs escalares de cada réplica para el bootstrap. Devuelve una fila por
+    (Escenario, Tipo, Métrica) con la media, la desviación estándar, el
+    intervalo t de ``confidence`` y los percentiles bootstrap de la media, y
+    la lista de errores.
+    """
+    registry = discover_scenarios() if registry is None else registry
+    if scenarios is not None:
+        registry = registry[registry['Escenario_Completo'].isin(scenarios)]
+    runs = [run for _, run in registry.groupby('Ejecucion', sort=True)]
+    workers = LOAD_WORKERS if workers is None else workers
+
+    stats, samples, errores = {}, {}, []
+    executor = shared_process_pool(workers) if workers > 1 and len(runs) > 1 else None
+    try:
+        resultados = executor.map(replicate_kpis, runs) if executor else map(replicate_kpis, runs)
+        for df_run, errores_run in resultados:
+            errores.extend(errores_run)
+            for row in df_run.itertuples(index=False):
+                key = (row[0], row[1])
+                values = np.asarray(row[2:], dtype=np.float64)
+                stats.setdefault(key, RunningStats(len(REPLICATE_METRICS))).update(values)
+                samples.setdefault(key, []).append(values)
+    except BrokenProcessPool:
+        discard_process_pool(executor)
+        raise
+
+    alpha = (1 - confidence) / 2
+    rng = np.random.default_rng(seed)
+    rows = []
+    for (escenario, tipo), running in stats.items():
+        values = np.array(samples[(escenario, tipo)])
+        # 1. Intervalo t de Student sobre la media de Welford
+        std = np.sqrt(running.variance)
+        half_width = np.array([t_quantile(1 - alpha, n - 1) for n in running.n]) * std / np.sqrt(np.maximum(running.n, 1))
+        # 2. Percentiles bootstrap de la media (remuestreo de las réplicas)
+        resampled = values[rng.integers(0, len(values), (n_bootstrap, len(values)))]
+        with warnings.catch_warnings():
+            # Métricas sin ningún valor en las réplicas: la media queda NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            boot_means = np.nanmean(resampled, axis=1)
+            boot_lo, boot_hi = np.nanpercentile(boot_means, [alpha * 100, (1 - alpha) * 100], axis=0)
+        for k, metrica in enumerate(REPLICATE_METRICS):
+            rows.append((escenario, tipo, metrica, int(running.n[k]), running.mean[k] if running.n[k] else np.nan,
+                         std[k], running.mean[k] - half_width[k], running.mean[k] + half_width[k],
+                         boot_lo[k], boot_hi[k]))
+
+    columns = ['Escenario', 'Tipo', 'Métrica', 'Réplicas', 'Media', 'Desv_Estandar',
+               'IC_Inf', 'IC_Sup', 'Bootstrap_Inf', 'Bootstrap_Sup']
+    df = pd.DataFrame(rows, columns=columns).sort_values(['Escenario', 'Tipo', 'Métrica'], ignore_index=True)
+    return df, errores
+
+def replicate_error_bars(df_replicas):
+    """Tabla ancha para gráficos de barras: media por métrica y semiancho del IC en ``<métrica> IC``."""
+    df = df_replicas.assign(
+        Escenario_Completo=[scenario_name(e, t) for e, t in zip(df_replicas['Escenario'], df_replicas['Tipo'])],
+        IC=df_replicas['IC_Sup'] - df_replicas['Media'],
+    )
+    wide = df.pivot(index=['Escenario_Completo', 'Escenario', 'Tipo'], columns='Métrica', values=['Media', 'IC'])
+    wide.columns = [metrica if value == 'Media' else f'{metrica} IC' for value, metrica in wide.columns]
+    replicas = df.groupby('Escenario_Completo')['Réplicas'].max()
+    return wide.reset_index().assign(Réplicas=lambda w: w['Escenario_Completo'].map(replicas))
+
+def file_stamps(paths):
+    """Marca (mtime_ns, tamaño) de cada archivo; los que ya no existen se omiten."""
+    stamps = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stamps[path] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+def files_version(paths):
+    """Hash corto de las marcas (mtime, tamaño) de los archivos: cambia si alguno cambia."""
+    stamps = sorted(file_stamps(paths).items())
+    return hashlib.blake2b(repr(stamps).encode(), digest_size=8).hexdigest()
+
+def payload_bytes(value):
+    """Estimación barata, sin serializar, de los bytes de una estructura de dicts, listas y arrays."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(payload_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_bytes(item) for item in value)
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+class FigureCache:
+    """Caché LRU, acotada en bytes, de figuras ya construidas y compartida entre sesiones.
+
+    ``get_or_build(key, build)`` devuelve la figura guardada con ``key`` o la
+    construye con ``build()``. ``size`` estima el tamaño de cada entrada (p. ej.
+    los bytes de sus arrays de datos); al pasar de ``max_bytes`` se descartan las menos
+    usadas. Las figuras guardadas no deben modificarse. La construcción se hace
+    fuera del lock, así que dos sesiones pueden construir la misma figura a la
+    vez; se guarda la primera.
+    """
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MAX_BYTES, size=None):
+        self.max_bytes = max_bytes
+        self.size = (lambda value: 0) if size is None else size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = build()
+        n_bytes = self.size(value)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, n_bytes)
+                self.bytes += n_bytes
+            value = self._entries[key][0]
+            # Siempre queda al menos la última figura, aunque sola supere el límite
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Entradas, bytes y aciertos/fallos acumulados."""
+        with self._lock:
+            return {'Figuras': len(self._entries), 'MB': self.bytes / 1024 / 1024,
+                    'Aciertos': self.hits, 'Fallos': self.misses}
+
+class IncrementalResults:
+    """Frames por escenario que se actualizan re-parseando solo los archivos modificados.
+
+    Guarda la parte que aporta cada archivo (filas de energía, flujos,
+    histogramas y eventos de animación) junto con su marca de mtime y tamaño
+    y, como SharedStore, los frames ya tipados de cada escenario; ``classes``
+    limita las clases de archivo seguidas (todas por defecto). ``refresh``
+    vuelve a descubrir los escenarios (solo un glob), compara las marcas,
+    parsea únicamente los archivos nuevos o cambiados y rehace (esquema,
+    métricas e histogramas) solo los escenarios afectados, de modo que el
+    coste depende del tamaño del cambio y no del total de resultados.
+    """
+
+    # Frames de cada escenario, con los nombres de SharedStore.KINDS
+    FRAMES = {
+        'energia': ENERGIA_COLUMNS, 'metricas': SCENARIO_KEYS, 'histogramas': HIST_COLUMNS,
+        'flujos': FLUJOS_COLUMNS, 'animacion': NETANIM_COLUMNS,
+    }
+    # Clase de archivo cuyo orden en el registro siguen los frames consolidados (el resto, por escenario)
+    ORDER = {'energia': 'ENERGIA', 'flujos': 'METRICAS', 'animacion': 'ANIM'}
+
+    def __init__(self, root=None, scenarios=None, workers=None, classes=None):
+        self.root = root
+        self.scenarios = None if scenarios is None else set(scenarios)
+        self.classes = tuple(CLASS_LOADERS) if classes is None else tuple(classes)
+        self.workers = workers
+        # refresh puede llamarse desde varias sesiones de Streamlit a la vez
+        self._lock = threading.Lock()
+        self.registry = pd.DataFrame(columns=REGISTRY_COLUMNS)
+        self.stamps = {}
+        self.parts = {clase: {} for clase in CLASS_LOADERS}
+        # ruta -> mensaje de error del último intento de carga
+        self.errores = {}
+        self.scenario_hists = {}
+        # escenario -> {nombre de frame: frame tipado}, en el orden del registro
+        self.frames = {}
+        self._categories = []
+        self.refresh()
+
+    @instrumented()
+    def refresh(self):
+        """Aplica los cambios del directorio de resultados y devuelve los escenarios afectados."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self):
+        # 1. Archivos actuales y sus marcas
+        registry = discover_scenarios(self.root)
+        registry = registry[registry['Clase'].isin(self.classes)]
+        if self.scenarios is not None:
+            registry = registry[registry['Escenario_Completo'].isin(self.scenarios)]
+        stamps = file_stamps(registry['Archivo'])
+        registry = registry[registry['Archivo'].isin(stamps)]
+
+        # 2. Archivos nuevos, modificados o eliminados (por mtime y tamaño)
+        changed = {path for path, stamp in stamps.items() if self.stamps.get(path) != stamp}
+        removed = set(self.stamps) - set(stamps)
+        if not changed and not removed:
+            return set()
+
+        old_rows = self.registry[self.registry['Archivo'].isin(changed | removed)]
+        new_rows = registry[registry['Archivo'].isin(changed)]
+        affected = set(old_rows['Escenario_Completo']) | set(new_rows['Escenario_Completo'])
+
+        # 3. Parseo solo de los archivos cambiados
+        tasks = [(CLASS_LOADERS[row.Clase], row.Archivo) for row in new_rows.itertuples(index=False)]
+        results, errores = load_files(tasks, self.workers) if tasks else ({}, {})
+
+        for path in changed | removed:
+            self.errores.pop(path, None)
+            for parts in self.parts.values():
+                parts.pop(path, None)
+        self.errores.update(errores)
+
+        builders = {'ENERGIA': _energy_part, 'METRICAS': _flow_part, 'ANIM': _scenario_part}
+        for row in new_rows.itertuples(index=False):
+            if row.Archivo in results:
+                self.parts[row.Clase][row.Archivo] = builders[row.Clase](row, results[row.Archivo])
+
+        self.registry, self.stamps = registry, stamps
+        self._patch(affected)
+        return affected
+
+    def _scenario_frames(self, files):
+        """Frames sin tipar e histogramas de un escenario a partir de las partes de sus archivos."""
+        metric_files = registry_files(files, 'METRICAS')
+        metric_parts = {path: self.parts['METRICAS'][path] for path in metric_files['Archivo'] if path in self.parts['METRICAS']}
+        hists = _merge_scenario_histograms(metric_files, metric_parts)
+        df_flujos = _concat_parts(metric_files, {path: part[0] for path, part in metric_parts.items()}, FLUJOS_COLUMNS)
+        return hists, {
+            'energia': _concat_parts(registry_files(files, 'ENERGIA'), self.parts['ENERGIA'], ENERGIA_COLUMNS),
+            'metricas': _scenario_metrics(df_flujos, hists),
+            'histogramas': _histograms_frame(hists),
+            'flujos': df_flujos,
+            'animacion': _concat_parts(registry_files(files, 'ANIM'), self.parts['ANIM'], NETANIM_COLUMNS),
+        }
+
+    def _patch(self, affected):
+        """Rehace los frames tipados de los escenarios afectados; el resto se conserva."""
+        scenario_order = self.registry['Escenario_Completo'].unique()
+        categories = sorted(scenario_order)
+
+        # 1. Escenarios afectados: histogramas, métricas y esquema tipado solo de sus filas
+        self.scenario_hists = {key: hist for key, hist in self.scenario_hists.items() if key[0] not in affected}
+        for escenario in affected:
+            self.frames.pop(escenario, None)
+            files = self.registry[self.registry['Escenario_Completo'] == escenario]
+            if not files.empty:
+                hists, frames = self._scenario_frames(files)
+                self.scenario_hists.update(hists)
+                self.frames[escenario] = {name: apply_schema(df, categories) for name, df in frames.items()}
+
+        # 2. Si cambió el conjunto de escenarios, solo se recodifican las categorías de los demás
+        if categories != self._categories:
+            for escenario, frames in self.frames.items():
+                if escenario not in affected:
+                    self.frames[escenario] = {
+                        name: df.assign(Escenario_Completo=df['Escenario_Completo'].cat.set_categories(categories))
+                        for name, df in frames.items()
+                    }
+            self._categories = categories
+
+        # 3. Orden del registro (el de load_all_data)
+        self.frames = {escenario: self.frames[escenario] for escenario in scenario_order if escenario in self.frames}
+
+    def _scenario_parts(self):
+        parts = {name: {escenario: frames[name] for escenario, frames in self.frames.items()} for name in self.FRAMES}
+        return parts, list(self.errores.values())
+
+    def scenario_parts(self):
+        """({nombre: {escenario: frame}}, errores), como SharedStore.get, sin concatenar."""
+        with self._lock:
+            return self._scenario_parts()
+
+    def data(self):
+        """Frames con la misma forma que ``load_all_data`` (concatenados en el orden de sus archivos)."""
+        with self._lock:
+            parts, errores = self._scenario_parts()
+            registry = self.registry
+        frames = {}
+        for name, columns in self.FRAMES.items():
+            clase = self.ORDER.get(name)
+            order = sorted(parts[name]) if clase is None else registry_files(registry, clase)['Escenario_Completo'].unique()
+            frames[name] = _concat_typed([parts[name][escenario] for escenario in order if escenario in parts[name]], columns)
+        df_metricas = frames['metricas'] if parts['metricas'] else _scenario_metrics(pd.DataFrame(columns=FLUJOS_COLUMNS), {})
+        df_metricas = df_metricas.sort_values(SCENARIO_KEYS, ignore_index=True)
+        return frames['energia'], df_metricas, frames['histogramas'], frames['flujos'], errores
+
+class EnergyTail:
+    """Lee de forma incremental las filas que se van añadiendo a un CSV de energía.
+
+    Guarda el desplazamiento ya leído y el último consumo de cada nodo, de modo
+    que la suma y el promedio se actualizan en O(filas nuevas). Si el archivo se
+    trunca (la simulación se reinicia) se vuelve a leer desde el principio.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.header = None
+        self.consumo = {}
+        self.total = 0.0
+
+    def poll(self):
+        """Procesa las líneas completas añadidas desde la última lectura; True si hubo cambios."""
+        if os.path.getsize(self.file_path) < self.offset:
+            self._reset()
+        with open(self.file_path, 'rb') as fh:
+            fh.seek(self.offset)
+            chunk = fh.read()
+        # La última línea puede estar a medio escribir: se deja para la siguiente lectura
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        if not complete:
+            return False
+        self.offset += len(complete)
+
+        text = complete.decode()
+        if self.header is None:
+            self.header, _, text = text.partition('\n')
+            self.header += '\n'
+        if not text.strip():
+            return True
+
+        rows = pd.read_csv(io.StringIO(self.header + text), usecols=['Nodo_ID', 'Energia_Consumida(J)'])
+        rows = rows.drop_duplicates('Nodo_ID', keep='last')
+        for node_id, consumed in zip(rows['Nodo_ID'].tolist(), rows['Energia_Consumida(J)'].tolist()):
+            self.total += consumed - self.consumo.get(node_id, 0.0)
+            self.consumo[node_id] = consumed
+        return True
+
+    def frame(self):
+        """Último consumo conocido de cada nodo."""
+        return pd.DataFrame({
+            'Nodo_ID': list(self.consumo), 'Energia_Consumida(J)': list(self.consumo.values())
+        })
+
+# Instantánea de FlowMonitor vigente de un escenario: marca (ruta, mtime, tamaño), totales, histogramas y flujos
+FlowSnapshot = namedtuple('FlowSnapshot', ['stamp', 'totals', 'hists', 'flows'])
+
+class LiveResults:
+    """Agregados en vivo de una simulación de ns-3 que todavía está escribiendo resultados.
+
+    Los CSV de energía se siguen con EnergyTail (solo se leen las filas nuevas) y
+    de cada escenario se toma la instantánea de FlowMonitor más reciente: como
+    sus contadores son acumulados, basta con sustituir los totales y los
+    histogramas de la instantánea anterior. Una instantánea a medio escribir
+    (XML inválido) se ignora hasta la siguiente consulta.
+    """
+
+    def __init__(self, root=None, scenarios=None):
+        self.root = root
+        self.scenarios = None if scenarios is None else set(scenarios)
+        self._lock = threading.Lock()
+        self.energy_tails = {}
+        # Instantánea vigente de cada escenario
+        self.snapshots = {}
+        self.errores = {}
+        self.poll()
+
+    @instrumented()
+    def poll(self):
+        """Incorpora los datos nuevos y devuelve los escenarios que cambiaron."""
+        with self._lock:
+            return self._poll()
+
+    def _poll(self):
+        registry = discover_scenarios(self.root)
+        if self.scenarios is not None:
+            registry = registry[registry['Escenario_Completo'].isin(self.scenarios)]
+        self.registry = registry
+        changed = set()
+
+        # 1. Filas nuevas de los CSV de energía
+        for row in registry_files(registry, 'ENERGIA').itertuples(index=False):
+            tail = self.energy_tails.setdefault(row.Archivo, EnergyTail(row.Archivo))
             try:
-                escenario_completo = f"{'S_con_Seguridad' if key.startswith('S_') else 'NS_sin_Seguridad'} - {'Base' if 'BASE' in key else 'Ataque'}"
-                tree = ET.parse(FILES[key])
-                root = tree.getroot()
-                metrics = get_base_metrics(root, escenario_completo)
-                
-                # Consolidar métricas principales
-                metricas_data.append({
-                    'Escenario': 'S_con_Seguridad' if key.startswith('S_') else 'NS_sin_Seguridad',
-                    'Tipo': 'Base' if 'BASE' in key else 'Ataque',
-                    'Escenario_Completo': escenario_completo,
-                    'Retardo_Sum (s)': metrics['Retardo_Sum (s)'],
-                    'Jitter_Sum (s)': metrics['Jitter_Sum (s)'],
-                    'Retardo_Promedio (s)': metrics['Retardo_Promedio (s)'],
-                    'Jitter_Promedio (s)': metrics['Jitter_Promedio (s)'],
-                    'Bytes_x_Paquete': metrics['Bytes_x_Paquete'],
-                    'Paquetes_RX': metrics['RX_Packets'],
-                    'Paquetes_Perdidos': metrics['Lost_Packets']
-                })
-                
-                # Consolidar datos de histograma
-                if not metrics['df_delay_hist'].empty:
-                    hist_data.append(metrics['df_delay_hist'])
-                if not metrics['df_jitter_hist'].empty:
-                    hist_data.append(metrics['df_jitter_hist'])
-                
-            except Exception as e:
-                # print(f"Error al cargar el archivo de métricas {FILES[key]}: {e}")
-                pass
-            
-    df_metricas = pd.DataFrame(metricas_data)
-    
-    if hist_data:
-        df_histograms = pd.concat(hist_data, ignore_index=True)
-    else:
-        df_histograms = pd.DataFrame(columns=['Escenario_Completo', 'Métrica', 'Rango_Inicio (s)', 'Rango_Ancho (s)', 'Conteo'])
-    
-    return df_energia, df_metricas, df_histograms
\ No newline at end of file
+                if tail.poll():
+                    changed.add(row.Escenario_Completo)
+                self.errores.pop(row.Archivo, None)
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                self.errores[row.Archivo] = f'{row.Archivo}: {type(e).__name__}: {e}'
+
+        # 2. Instantánea de FlowMonitor más reciente de cada escenario
+        metric_files = registry_files(registry, 'METRICAS')
+        stamps = file_stamps(metric_files['Archivo'])
+        metric_files = metric_files[metric_files['Archivo'].isin(stamps)]
+        self.snapshots = {
+            escenario: snap for escenario, snap in self.snapshots.items()
+            if snap.stamp[0] in stamps
+        }
+        for escenario, files in metric_files.groupby(metric_files['Escenario_Completo'].to_numpy()):
+            row = max(files.itertuples(index=False), key=lambda r: stamps[r.Archivo])
+            stamp = (row.Archivo, stamps[row.Archivo])
+            if escenario in self.snapshots and self.snapshots[escenario].stamp == stamp:
+                continue
+            try:
+                result = load_flow_stats(row.Archivo)
+            except (OSError, ET.ParseError, ValueError) as e:
+                self.errores[row.Archivo] = f'{row.Archivo}: {type(e).__name__}: {e}'
+                continue
+            aviso = flow_time_warning(result)
+            if aviso:
+                self.errores[row.Archivo] = f'{row.Archivo}: {aviso}'
+            else:
+                self.errores.pop(row.Archivo, None)
+            df_flows, hists = _flow_part(row, result)
+            totals = df_flows.groupby(SCENARIO_KEYS, observed=True).agg(**FLOW_TOTALS)
+            self.snapshots[escenario] = FlowSnapshot(stamp, totals, hists, df_flows)
+            changed.add(escenario)
+        return changed
+
+    def data(self):
+        """Frames con la misma forma que ``load_all_data``, a partir de los agregados en vivo."""
+        with self._lock:
+            # 1. Energía: último consumo de cada nodo
+            energy_files = registry_files(self.registry, 'ENERGIA')
+            parts = {
+                row.Archivo: _energy_part(row, self.energy_tails[row.Archivo].frame())
+                for row in energy_files.itertuples(index=False) if row.Archivo in self.energy_tails
+            }
+            df_energia = _concat_parts(energy_files, parts, ENERGIA_COLUMNS)
+
+            # 2. Métricas a partir de los totales de cada instantánea
+            snapshots = [snap for _, snap in sorted(self.snapshots.items())]
+            totals = [snap.totals for snap in snapshots if not snap.totals.empty]
+            if totals:
+                df_metricas = totals_summary(pd.concat(totals).sort_index()).reset_index()
+            else:
+                df_metricas = aggregate_flows(pd.DataFrame(columns=FLUJOS_COLUMNS), by=SCENARIO_KEYS)
+            scenario_hists = {
+                (escenario, metrica): hist
+                for escenario, snap in self.snapshots.items() for metrica, hist in snap.hists.items()
+            }
+            df_metricas = _add_delay_percentiles(df_metricas, scenario_hists)
+
+            # 3. Flujos de las instantáneas actuales
+            flows = [snap.flows for snap in snapshots]
+            df_flujos = pd.concat(flows, ignore_index=True) if flows else pd.DataFrame(columns=FLUJOS_COLUMNS)
+
+            frames = df_energia, df_metricas, _histograms_frame(scenario_hists), df_flujos
+            scenarios = self.registry['Escenario_Completo'].unique()
+            return (*(apply_schema(df, scenarios) for df in frames), list(self.errores.values()))
+
+def split_by_scenario(df):
+    """Divide un frame en un dict escenario -> filas del escenario.
+
+    Si las filas de cada escenario ya son contiguas (el caso de los frames
+    consolidados en el orden del registro) cada parte es una vista ``iloc``
+    del frame original, sin copiar datos; si no, se reordena una sola vez.
+    """
+    if df.empty:
+        return {}
+    values = df['Escenario_Completo']
+    codes, uniques = pd.factorize(values.astype(object) if isinstance(values.dtype, pd.CategoricalDtype) else values)
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    if len(starts) != len(uniques):
+        order = np.argsort(codes, kind='stable')
+        df, codes = df.iloc[order], codes[order]
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    ends = np.append(starts[1:], len(df))
+    return {uniques[codes[start]]: df.iloc[start:end] for start, end in zip(starts, ends)}
+
+def concat_scenarios(parts, scenarios, columns):
+    """Concatena las partes de los escenarios indicados (solo para frames pequeños)."""
+    frames = [parts[escenario] for escenario in scenarios if escenario in parts]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+class SharedStore:
+    """Frames de solo lectura compartidos por todas las sesiones de la app.
+
+    Cada escenario se parsea una sola vez (los que faltan se cargan juntos en
+    un lote con el loader de su tipo en KINDS) y se guarda dividido por
+    escenario con split_by_scenario. Las sesiones
+    reciben dicts escenario -> frame que apuntan a los mismos datos, así que
+    la memoria no crece con el número de usuarios. Los frames no deben
+    modificarse en el sitio; con Copy-on-Write, cualquier filtrado o columna
+    nueva en una sesión crea su propia copia.
+    """
+
+    # Tipos de datos del almacén: loader y nombres de los frames que devuelve
+    KINDS = {
+        'datos': (load_all_data, ('energia', 'metricas', 'histogramas', 'flujos')),
+        'animacion': (load_all_netanim_data, ('animacion',)),
+        'trazas': (load_all_energy_traces, ('trazas',)),
+        'sondas': (load_all_flow_probes, ('sondas',)),
+    }
+
+    def __init__(self, registry=None, workers=None, max_scenarios=SHARED_STORE_MAX_SCENARIOS):
+        self.registry = discover_scenarios() if registry is None else registry
+        self.workers = workers
+        self.max_scenarios = max_scenarios
+        self._lock = threading.Lock()
+        # (tipo, escenario) -> {nombre de frame: frame}, en orden de uso (LRU)
+        self._parts = OrderedDict()
+        self._errores = {kind: [] for kind in self.KINDS}
+
+    def get(self, kind, scenarios):
+        """Devuelve ({nombre: {escenario: frame}}, errores) de los escenarios indicados."""
+        loader, names = self.KINDS[kind]
+        scenarios = list(scenarios)
+        with self._lock:
+            missing = [escenario for escenario in scenarios if (kind, escenario) not in self._parts]
+            if missing:
+                *frames, errores = loader(self.registry, missing, self.workers)
+                splits = [split_by_scenario(df) for df in frames]
+                for escenario in missing:
+                    # Escenarios sin filas (p. ej. sin archivos de esta clase) quedan con frames vacíos
+                    self._parts[(kind, escenario)] = {
+                        name: split.get(escenario, df.iloc[:0]) for name, split, df in zip(names, splits, frames)
+                    }
+                self._errores[kind] = sorted(set(self._errores[kind]) | set(errores))
+
+            result = {name: {} for name in names}
+            for escenario in scenarios:
+                self._parts.move_to_end((kind, escenario))
+                for name, df in self._parts[(kind, escenario)].items():
+                    result[name][escenario] = df
+            while len(self._parts) > self.max_scenarios:
+                self._parts.popitem(last=False)
+            return result, list(self._errores[kind])